@@ -0,0 +1,183 @@
+from itertools import chain
+
+import numpy as np
+
+
+class BatchResult:
+    """
+    Outcome of a batch run: final state arrays of every robot and the REPORT records.
+
+    Headings are indexes into DIRECTIONS, -1 for robots that were never placed. REPORT records are kept
+    as parallel arrays (robot, step, x, y, heading) ordered by step.
+    """
+
+    def __init__(self, x, y, heading, placed, ignored, reports):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.placed = placed
+        self.ignored = ignored
+        self.report_robot, self.report_step, self.report_x, self.report_y, self.report_heading = reports
+
+    def __len__(self):
+        return len(self.x)
+
+    def final_pose(self, robot):
+        """Final (x, y, direction) of a robot, (None, None, None) if it was never placed."""
+        if not self.placed[robot]:
+            return None, None, None
+        return int(self.x[robot]), int(self.y[robot]), BatchSimulator.DIRECTIONS[self.heading[robot]]
+
+    def reports(self, robot):
+        """REPORT lines of a robot, formatted like Robot.report prints them."""
+        mask = self.report_robot == robot
+        return ['{} {} {}'.format(x, y, BatchSimulator.DIRECTIONS[h]) for x, y, h in
+                zip(self.report_x[mask].tolist(), self.report_y[mask].tolist(), self.report_heading[mask].tolist())]
+
+
+class BatchSimulator:
+    """
+    Runs many command scripts at once, one robot per script, with the rules of Robot.
+
+    Scripts are compiled into an opcode matrix (steps x robots) and every step is applied to all robots
+    with array operations: PLACE checks, MOVE with edge checks, rotations and REPORT recording. Commands
+    are recognized on their bytes, only the distinct PLACE commands are parsed by Python.
+    """
+    DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+    # Opcodes, PLACE commands are encoded as PLACE + index of their operands
+    NOP, MOVE, LEFT, RIGHT, REPORT, OTHER, PLACE = range(7)
+    OPCODES = {'MOVE': MOVE, 'LEFT': LEFT, 'RIGHT': RIGHT, 'REPORT': REPORT}
+    # Prefix of the PLACE commands
+    PLACE_PREFIX = 'PLACE '
+    # Masks keeping the first n bytes of 8
+    MASKS = np.array([(1 << 8 * n) - 1 for n in range(9)], dtype=np.uint64)
+
+    # Constructor with default table length and width
+    def __init__(self, length: int = 5, width: int = 5):
+        self.length = length
+        self.width = width
+
+    def compile(self, scripts):
+        """
+        Compile the scripts into a program: an opcode matrix (steps x robots) and the PLACE commands.
+
+        PLACE commands appear as PLACE in the matrix, their (step, robot, x, y, heading) are kept apart,
+        ordered by step.
+        """
+        lengths = np.fromiter(map(len, scripts), dtype=np.int64, count=len(scripts))
+        codes = self.opcodes(scripts, int(lengths.sum()))
+        ends = np.cumsum(lengths)
+        firsts = ends - lengths
+        place = np.flatnonzero(codes == self.PLACE)
+        place_robots = np.searchsorted(ends, place, side='right')
+        place_steps = place - firsts[place_robots]
+        operands = self.decode([scripts[robot][step] for robot, step in zip(place_robots.tolist(),
+                                                                             place_steps.tolist())])
+        ops = np.full((int(lengths.max()) if len(scripts) else 0, len(scripts)), self.NOP, dtype=np.int8)
+        if len(scripts) and (lengths == lengths[0]).all():
+            ops[:] = codes.reshape(len(scripts), -1).T
+        else:
+            robots = np.repeat(np.arange(len(scripts)), lengths)
+            ops[np.arange(len(codes)) - np.repeat(firsts, lengths), robots] = codes
+        order = np.argsort(place_steps, kind='stable')
+        places = np.column_stack((place_steps[order], place_robots[order], operands[order]))
+        return ops, places
+
+    def opcodes(self, scripts, count: int):
+        """
+        Opcode of every command of the scripts, PLACE for the commands starting with 'PLACE '.
+
+        The commands are joined into one buffer and read 8 bytes at a time from the start of every line,
+        the first 7 bytes and the length of a command make a key compared with the keys of the known commands.
+        """
+        text = '\n'.join(chain.from_iterable(scripts)).encode()
+        if text.count(b'\n') != max(count - 1, 0):
+            # Commands holding line breaks
+            return np.array([self.OPCODES.get(command, self.PLACE if command.startswith(self.PLACE_PREFIX)
+                                              else self.OTHER) for command in chain.from_iterable(scripts)],
+                            dtype=np.int8)
+        buffer = np.zeros(len(text) + 8, dtype=np.uint8)
+        buffer[:len(text)] = np.frombuffer(text, dtype=np.uint8)
+        starts = np.empty(count, dtype=np.int64)
+        starts[:1] = 0
+        starts[1:] = np.flatnonzero(buffer == ord('\n'))
+        starts[1:] += 1
+        lengths = np.empty(count, dtype=np.int64)
+        np.subtract(starts[1:], starts[:-1] + 1, out=lengths[:-1])
+        lengths[-1:] = len(text) - starts[-1:]
+        # 8 bytes from every offset of the buffer, little-endian
+        keys = np.ndarray((len(text) + 1,), dtype='<u8', buffer=buffer, strides=(1,))[starts]
+        prefix = keys & self.MASKS[len(self.PLACE_PREFIX)]
+        np.minimum(lengths, 8, out=lengths)
+        keys &= self.MASKS[np.minimum(lengths, 7)]
+        keys |= lengths.astype(np.uint64) << np.uint64(56)
+        codes = np.full(count, self.OTHER, dtype=np.int8)
+        codes[(prefix == self.key(self.PLACE_PREFIX)) & (lengths >= len(self.PLACE_PREFIX))] = self.PLACE
+        for command, op in self.OPCODES.items():
+            codes[keys == self.key(command) | len(command) << 56] = op
+        return codes
+
+    @staticmethod
+    def key(command: str) -> int:
+        return int.from_bytes(command.encode(), 'little')
+
+    def decode(self, commands: [str]):
+        """(x, y, heading) of PLACE commands, heading -1 for an unknown direction, distinct commands decoded once."""
+        decoded = {}
+        for command in commands:
+            if command not in decoded:
+                x, y, direction = command[len(self.PLACE_PREFIX):].split(',')
+                heading = self.DIRECTIONS.index(direction) if direction in self.DIRECTIONS else -1
+                decoded[command] = int(x), int(y), heading
+        return np.array([decoded[command] for command in commands], dtype=np.int64).reshape(-1, 3)
+
+    def run(self, scripts) -> BatchResult:
+        """Run every script on its own robot and return the final states and REPORT records."""
+        return self.execute(*self.compile(scripts))
+
+    def execute(self, ops, places) -> BatchResult:
+        """Run a compiled program and return the final states and REPORT records."""
+        steps, count = ops.shape
+        # Effect of every command, found once for the whole matrix; gathers are slower than arithmetic per step
+        waits = ((ops >= self.MOVE) & (ops <= self.OTHER)).view(np.int8)
+        # Unknown commands are ignored by placed robots too
+        unknown = (ops == self.OTHER).view(np.int8)
+        turns = 3 * (ops == self.LEFT).view(np.int8) + (ops == self.RIGHT).view(np.int8)
+        moves = (ops == self.MOVE).view(np.int8)
+        place_bounds = np.searchsorted(places[:, 0], np.arange(steps + 1))
+        x = np.zeros(count, dtype=np.int32)
+        y = np.zeros(count, dtype=np.int32)
+        heading = np.zeros(count, dtype=np.int8)
+        placed = np.zeros(count, dtype=np.int8)
+        ignored = np.zeros(count, dtype=np.int32)
+        reports = []
+        for t in range(steps):
+            # Any command but PLACE is ignored until the robot has been placed
+            ignored += waits[t] * (1 - placed) + unknown[t] * placed
+            heading = (heading + turns[t] * placed) & 3
+            move = moves[t] * placed
+            # Offsets of a MOVE: EAST and WEST are the odd headings
+            odd = heading & 1
+            mx = odd * (2 - heading) * move
+            my = (1 - odd) * (1 - heading) * move
+            # Negative positions wrap around to large unsigned values
+            inside = ((x + mx).view(np.uint32) < self.length) & ((y + my).view(np.uint32) < self.width)
+            x += mx * inside
+            y += my * inside
+            ignored += move * ~inside
+            robots = np.flatnonzero((ops[t] == self.REPORT).view(np.int8) & placed)
+            if len(robots):
+                reports.append((robots, np.full(len(robots), t), x[robots], y[robots], heading[robots]))
+            # PLACE on a valid position and direction
+            if place_bounds[t] < place_bounds[t + 1]:
+                _, robots, px, py, ph = places[place_bounds[t]:place_bounds[t + 1]].T
+                valid = (0 <= px) & (px < self.length) & (0 <= py) & (py < self.width) & (ph >= 0)
+                x[robots[valid]], y[robots[valid]], heading[robots[valid]] = px[valid], py[valid], ph[valid]
+                placed[robots[valid]] = 1
+                ignored[robots[~valid]] += 1
+        if reports:
+            reports = [np.concatenate(column) for column in zip(*reports)]
+        else:
+            reports = [np.zeros(0, dtype=np.int64) for _ in range(5)]
+        placed = placed.astype(bool)
+        return BatchResult(x, y, np.where(placed, heading, -1), placed, ignored, reports)
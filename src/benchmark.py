@@ -0,0 +1,377 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import events
+import planners
+from batch import BatchSimulator
+from bytecode import compile_commands
+from robot import Robot
+from routing import Router, SolverConfig
+
+# Folder of the command files used as correctness fixtures
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+# Ratio of a measure to its baseline above which it is reported as a regression
+THRESHOLD = 1.25
+# Smallest end-to-end speed-up of BatchSimulator over a loop of Robot instances
+BATCH_SPEEDUP = 3
+# Longest route of a fleet over an even share of the commands, above which the routes are reported as unbalanced
+BALANCE = 1.5
+
+
+def generate_script(steps: int, length: int, width: int, seed: int = 0, unknown: float = 0.0) -> [str]:
+    """
+    Random script of a number of commands, starting with a PLACE and with a PLACE every 1000 commands.
+
+    A share of unknown commands can be mixed in, they are ignored like Robot does.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(['MOVE', 'LEFT', 'RIGHT', 'REPORT', 'JUMP'])
+    script = names[rng.choice(5, size=steps, p=[0.7 - unknown, 0.14, 0.14, 0.02, unknown])].tolist()
+    for i in range(0, steps, 1000):
+        script[i] = 'PLACE {},{},{}'.format(rng.integers(length), rng.integers(width),
+                                            Robot.DIRECTIONS[rng.integers(4)])
+    return script
+
+
+def generate_table(size: int, blocked: float = 0.0, seed: int = 0):
+    """Square table with a share of blocked cells, the robot starts from (0, 0)."""
+    rng = np.random.default_rng(seed)
+    grid = np.where(rng.random((size, size)) < blocked, -1, 0)
+    grid[0, 0] = 1
+    return grid
+
+
+def route_quality(grid, commands) -> dict:
+    """Length, turns and coverage of the route of a list of commands over a table."""
+    stats = Router().cost_model.evaluate(commands)
+    reachable = set(Router.create_data_model(grid)['locations'])
+    visited = set(Router.cells_of(commands))
+    return {
+        'moves': stats['moves'],
+        'turns': stats['turns'],
+        'coverage': len(visited & reachable) / max(len(reachable), 1),
+        'revisits': stats['moves'] - (len(visited) - 1),
+    }
+
+
+def measure(run, repeat: int = 1, memory: bool = True):
+    """Best wall time of repeat runs and the peak memory of one more traced run, with the result of the last run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    measures = {'time': min(times)}
+    if memory:
+        tracemalloc.start()
+        result = run()
+        measures['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return measures, result
+
+
+def bench_simulate(steps_list, repeat):
+    """Robot.process_commands on random scripts, warnings are discarded."""
+    results = {}
+    for steps in steps_list:
+        script = generate_script(steps, 100, 100)
+        robot = Robot(length=100, width=100)
+
+        def run():
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                robot.process_commands(script)
+            return robot.x, robot.y, robot.direction
+
+        measures, final = measure(run, repeat)
+        measures['steps_per_second'] = steps / measures['time']
+        measures['final'] = list(final)
+        results['simulate/{}'.format(steps)] = measures
+    return results
+
+
+def bench_batch(shapes, repeat):
+    """BatchSimulator on many random scripts, against Robot instances run one after the other on a sample."""
+    results = {}
+    for count, steps in shapes:
+        scripts = [generate_script(steps, 100, 100, seed, unknown=0.01) for seed in range(count)]
+        simulator = BatchSimulator(100, 100)
+        measures, result = measure(lambda: simulator.run(scripts), repeat, memory=False)
+        program = simulator.compile(scripts)
+        measures['execute'], _ = measure(lambda: simulator.execute(*program), repeat, memory=False)
+        measures['execute'] = measures['execute']['time']
+        sample = scripts[:max(1, count // 20)]
+        consistent = True
+        start = time.perf_counter()
+        for robot_id, script in enumerate(sample):
+            robot = Robot(length=100, width=100, metrics=events.Metrics())
+            robot.output = io.StringIO()
+            robot.process_commands(script)
+            consistent &= (result.reports(robot_id) == robot.output.getvalue().splitlines()
+                           and result.final_pose(robot_id) == (robot.x, robot.y, robot.direction)
+                           and result.ignored[robot_id] == ignored_count(robot.metrics))
+        loop = (time.perf_counter() - start) * count / len(sample)
+        measures['speedup'] = loop / measures['time']
+        measures['consistent'] = bool(consistent)
+        results['batch/{}x{}'.format(count, steps)] = measures
+    return results
+
+
+def bench_distance(sizes, repeat):
+    """Router.compute_euclidean_distance_matrix of full tables, with the first distance row."""
+    results = {}
+    for size in sizes:
+        locations = [(x, y) for y in range(size) for x in range(size)]
+        measures, _ = measure(lambda: Router.compute_euclidean_distance_matrix(locations).row(0), repeat)
+        results['distance/{0}x{0}'.format(size)] = measures
+    return results
+
+
+def bench_solve(tables, repeat, time_limit):
+    """Router.solve without cache, with the quality of the routes."""
+    results = {}
+    for size, blocked, backend in tables:
+        grid = generate_table(size, blocked)
+        router = Router(backend=backend, config=SolverConfig(time_limit=time_limit))
+        name = 'solve/{0}x{0}/{1}/{2}'.format(size, 'blocked' if blocked else 'free', backend)
+        try:
+            measures, commands = measure(lambda: router.solve(grid), repeat, memory=size <= 100)
+        except RuntimeError as e:
+            results[name] = {'error': str(e)}
+            continue
+        measures.update(route_quality(grid, commands))
+        results[name] = measures
+    return results
+
+
+def bench_stall(size, time_limit):
+    """Guided local search stopped by no_improvement_time, which should end well before the time limit."""
+    if not planners.available('ortools'):
+        return {}
+    config = SolverConfig(time_limit=time_limit, local_search_metaheuristic='GUIDED_LOCAL_SEARCH',
+                          no_improvement_time=time_limit / 10)
+    grid = generate_table(size, 0.1)
+    measures, commands = measure(lambda: Router(backend='ortools', config=config).solve(grid), memory=False)
+    measures.update(route_quality(grid, commands))
+    measures['stopped_early'] = measures['time'] < 0.9 * time_limit
+    return {'stall/{0}x{0}/blocked/ortools'.format(size): measures}
+
+
+def bench_fleet(tables, repeat, time_limit):
+    """Router.solve_fleet without cache, with the coverage and the makespan of the routes."""
+    results = {}
+    for size, blocked, robots, backend in tables:
+        if not planners.available(backend) and backend != 'auto':
+            continue
+        grid = generate_table(size, blocked)
+        # Robots start from the corners and the middle of the table
+        for x, y in [(0, 0), (size - 1, size - 1), (size // 2, size // 2), (size - 1, 0), (0, size - 1)][:robots]:
+            grid[y, x] = 1
+        router = Router(backend=backend, config=SolverConfig(time_limit=time_limit))
+        name = 'fleet/{0}x{0}/{1}/{2}/{3}'.format(size, 'blocked' if blocked else 'free', robots, backend)
+        measures, fleet = measure(lambda: router.solve_fleet(grid), repeat, memory=False)
+        reachable = set(Router.create_data_model(grid, fleet=True)['locations'])
+        visited = set().union(*(Router.cells_of(commands) for commands in fleet))
+        lengths = [len(commands) for commands in fleet]
+        measures['coverage'] = len(visited & reachable) / max(len(reachable), 1)
+        measures['makespan'] = max(lengths)
+        measures['balance'] = max(lengths) * len(lengths) / sum(lengths)
+        results[name] = measures
+    return results
+
+
+def bench_wrap(sizes, repeat):
+    """Router.wrap_result of the coverage routes of free tables."""
+    results = {}
+    for size in sizes:
+        data, routes = Router(backend='coverage').plan(generate_table(size))
+        measures, commands = measure(lambda: Router.wrap_result(data, routes), repeat)
+        measures['commands'] = len(commands)
+        results['wrap_result/{0}x{0}'.format(size)] = measures
+    return results
+
+
+def bench_replay(steps_list, repeat):
+    """Replay loop of the GUI, frames of Playback.BATCH steps drawn on a real window."""
+    import tkinter as tk
+    from robot_ui import RobotGUI
+    try:
+        gui = RobotGUI(width=100, height=100)
+    except tk.TclError as e:
+        return {'replay/{}'.format(steps): {'skipped': str(e)} for steps in steps_list}
+    from playback import Playback
+    results = {}
+    for steps in steps_list:
+        program = compile_commands(generate_script(steps, 100, 100))
+
+        def run():
+            gui.log_trace = True
+            gui.clear_trace()
+            playback = gui.playback = Playback(gui.root, gui, lambda: gui.actions([program]))
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                while playback.advance(playback.BATCH):
+                    gui.redraw()
+                    gui.root.update_idletasks()
+            return playback.position
+
+        measures, _ = measure(run, repeat, memory=False)
+        measures['steps_per_second'] = steps / measures['time']
+        results['replay/{}'.format(steps)] = measures
+    gui.root.destroy()
+    return results
+
+
+def ignored_count(metrics) -> int:
+    """Commands ignored by a robot, whatever the reason."""
+    return sum(value for name, value in metrics.counters.items() if name.startswith('ignored.'))
+
+
+def check_fixtures():
+    """Output of Robot on the command files of the data folder, checked against BatchSimulator."""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(DATA, '*.txt'))):
+        with open(path) as f:
+            script = f.read().splitlines()
+        robot = Robot(metrics=events.Metrics())
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            robot.process_commands(script)
+        reports = [line for line in output.getvalue().splitlines() if not line.startswith('[')]
+        batch = BatchSimulator().run([script])
+        if robot.placed:
+            consistent = batch.reports(0) == reports and batch.final_pose(0) == (robot.x, robot.y, robot.direction)
+        else:
+            consistent = not batch.placed[0]
+        fixtures[os.path.basename(path)] = {
+            'output': hashlib.sha256(output.getvalue().encode()).hexdigest(),
+            'consistent': bool(consistent and batch.ignored[0] == ignored_count(robot.metrics)),
+        }
+    return fixtures
+
+
+def compare(results, baseline, threshold: float = THRESHOLD) -> [str]:
+    """Regressions of the results against a baseline and unbalanced fleet routes, as lines of text."""
+    regressions = []
+    for name, measures in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if 'error' in measures and base and 'error' not in base:
+            regressions.append('{} failed: {}'.format(name, measures['error']))
+        if measures.get('consistent') is False:
+            regressions.append('{} Robot and BatchSimulator disagree'.format(name))
+        if measures.get('speedup', BATCH_SPEEDUP) < BATCH_SPEEDUP:
+            regressions.append('{} only x{:.1f} faster than Robot'.format(name, measures['speedup']))
+        if measures.get('stopped_early') is False:
+            regressions.append('{} search ran its whole time limit'.format(name))
+        if measures.get('balance', 1) > BALANCE:
+            regressions.append('{} unbalanced routes: makespan {} is x{:.2f} an even share'.format(
+                name, measures['makespan'], measures['balance']))
+        if not base:
+            continue
+        for key in ('time', 'peak_memory', 'moves', 'turns', 'revisits', 'makespan'):
+            if key in measures and base.get(key) and measures[key] > base[key] * threshold:
+                regressions.append('{} {}: {:.4g} -> {:.4g} (x{:.2f})'.format(
+                    name, key, base[key], measures[key], measures[key] / base[key]))
+        if measures.get('coverage', 1) < base.get('coverage', 1):
+            regressions.append('{} coverage: {:.4f} -> {:.4f}'.format(name, base['coverage'], measures['coverage']))
+        if 'final' in base and measures.get('final') != base['final']:
+            regressions.append('{} final pose: {} -> {}'.format(name, base['final'], measures.get('final')))
+    for name, fixture in results['fixtures'].items():
+        if not fixture['consistent']:
+            regressions.append('{} Robot and BatchSimulator disagree'.format(name))
+        base = baseline.get('fixtures', {}).get(name)
+        if base and base['output'] != fixture['output']:
+            regressions.append('{} output changed'.format(name))
+    return regressions
+
+
+def summary(results) -> str:
+    lines = []
+    for name, measures in results['benchmarks'].items():
+        if 'skipped' in measures or 'error' in measures:
+            lines.append('{:<36} {}'.format(name, measures.get('skipped') or 'error: ' + measures['error']))
+            continue
+        line = '{:<36} {:>10.4f}s'.format(name, measures['time'])
+        if 'peak_memory' in measures:
+            line += ' {:>10.1f}MB'.format(measures['peak_memory'] / 2 ** 20)
+        if 'speedup' in measures:
+            line += '  execute {:.4f}s x{:.1f} Robot'.format(measures['execute'], measures['speedup'])
+        elif 'makespan' in measures:
+            line += '  makespan {makespan} balance {balance:.2f} coverage {coverage:.3f}'.format(**measures)
+        elif 'coverage' in measures:
+            line += '  moves {moves} turns {turns} coverage {coverage:.3f}'.format(**measures)
+        elif 'steps_per_second' in measures:
+            line += '  {:.0f} steps/s'.format(measures['steps_per_second'])
+        lines.append(line)
+    consistent = sum(fixture['consistent'] for fixture in results['fixtures'].values())
+    lines.append('fixtures: {}/{} consistent'.format(consistent, len(results['fixtures'])))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulation, routing and rendering hot paths')
+    parser.add_argument('--full', action='store_true', help='also run 10^7 steps scripts and 500x500 blocked tables')
+    parser.add_argument('--only', help='comma separated groups: simulate,batch,distance,solve,fleet,wrap,replay')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark, the best time is kept')
+    parser.add_argument('--time-limit', type=float, default=5, help='search budget of the solver in seconds')
+    parser.add_argument('-o', '--output', help='JSON file of the results')
+    parser.add_argument('-b', '--baseline', help='JSON file of results to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='ratio reported as a regression')
+    args = parser.parse_args()
+    groups = args.only.split(',') if args.only else ['simulate', 'batch', 'distance', 'solve', 'fleet', 'wrap',
+                                                     'replay']
+
+    steps = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6] + ([10 ** 7] if args.full else [])
+    tables = [(size, 0.0, 'auto') for size in (5, 20, 50, 100, 500)]
+    tables += [(size, 0.1, backend) for size in (5, 20, 50, 100) for backend in ('auto', 'greedy')]
+    tables += [(500, 0.1, 'greedy')] + ([(500, 0.1, 'auto')] if args.full else [])
+    fleets = [(12, 0.0, 3, backend) for backend in ('auto', 'greedy', 'ortools', 'heading')]
+    fleets += [(60, blocked, 4, 'auto') for blocked in (0.0, 0.1)]
+    benchmarks = {}
+    if 'simulate' in groups:
+        benchmarks.update(bench_simulate(steps, args.repeat))
+    if 'batch' in groups:
+        benchmarks.update(bench_batch([(20000, 200), (1000, 4000)], args.repeat))
+    if 'distance' in groups:
+        benchmarks.update(bench_distance([5, 20, 50, 100, 500], args.repeat))
+    if 'solve' in groups:
+        benchmarks.update(bench_solve(tables, args.repeat, args.time_limit))
+        benchmarks.update(bench_stall(20, max(args.time_limit, 5)))
+    if 'fleet' in groups:
+        benchmarks.update(bench_fleet(fleets, args.repeat, args.time_limit))
+    if 'wrap' in groups:
+        benchmarks.update(bench_wrap([5, 20, 50, 100, 500], args.repeat))
+    if 'replay' in groups:
+        benchmarks.update(bench_replay(steps[:3], args.repeat))
+    results = {
+        'machine': {'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'benchmarks': benchmarks,
+        'fixtures': check_fixtures(),
+    }
+    print(summary(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    # Without a baseline only the checks of the results themselves are reported
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print('[REGRESSION]' + regression)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import sys
+from array import array
+from functools import lru_cache
+from itertools import islice
+
+# Available directions
+DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+# Opcodes, every instruction is a record of RECORD integers: opcode, step of its first command and 3 operands
+PLACE, MOVE, LEFT, RIGHT, REPORT, OTHER, INVALID = range(7)
+RECORD = 5
+OPCODES = {'MOVE': MOVE, 'LEFT': LEFT, 'RIGHT': RIGHT, 'REPORT': REPORT}
+NAMES = {code: name for name, code in OPCODES.items()}
+
+
+class Program:
+    """
+    Command script compiled into a compact array of fixed-width records.
+
+    - PLACE: x, y, heading; a direction which is not in DIRECTIONS is kept as -1 - index of its text
+    - MOVE: number of consecutive MOVE commands folded into the record
+    - LEFT, RIGHT, REPORT: no operand
+    - OTHER: index of the text of an unknown command
+    - INVALID: index of the text of a PLACE command whose operands can not be parsed
+
+    The step of a record is the index of its first command in the script, so warnings keep the
+    numbering of the original script.
+    """
+
+    def __init__(self, code: array = None, texts: [str] = None):
+        self.code = code if code is not None else array('q')
+        self.texts = texts if texts is not None else []
+
+    def __len__(self):
+        return len(self.code) // RECORD
+
+    def __iter__(self):
+        """Records as (opcode, step, a, b, c) tuples."""
+        code = self.code
+        for i in range(0, len(code), RECORD):
+            yield code[i], code[i + 1], code[i + 2], code[i + 3], code[i + 4]
+
+    def command(self, op, a=0, b=0, c=0):
+        """Text of a single command of a record."""
+        if op == PLACE:
+            return 'PLACE {},{},{}'.format(a, b, DIRECTIONS[c] if c >= 0 else self.texts[-1 - c])
+        if op == OTHER or op == INVALID:
+            return self.texts[a]
+        return NAMES[op]
+
+    def to_bytes(self) -> bytes:
+        """Serialized program: number of texts, their sizes, the texts and the records."""
+        texts = [text.encode() for text in self.texts]
+        header = array('q', [len(texts)] + [len(text) for text in texts])
+        return header.tobytes() + b''.join(texts) + self.code.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Program serialized by to_bytes."""
+        count = array('q', data[:8])[0]
+        sizes = array('q', data[8:8 * (count + 1)])
+        offset = 8 * (count + 1)
+        texts = []
+        for size in sizes:
+            texts.append(data[offset:offset + size].decode())
+            offset += size
+        return cls(array('q', data[offset:]), texts)
+
+
+def parse_place(command: str):
+    """Operands (x, y, direction) of a PLACE command, raises ValueError when they can not be parsed."""
+    x, y, direction = command[6:].split(',')
+    return int(x), int(y), direction
+
+
+def compile_commands(commands, start: int = 0) -> Program:
+    """Compile a list of command strings, MOVE runs are folded into a single record. Steps begin at start."""
+    program = Program()
+    code = program.code
+    texts = program.texts
+    last = -1
+    for step, command in enumerate(commands, start):
+        op = OPCODES.get(command)
+        if op == MOVE:
+            # Extend the current MOVE run
+            if last >= 0 and code[last] == MOVE:
+                code[last + 2] += 1
+                continue
+            record = (MOVE, step, 1, 0, 0)
+        elif op is not None:
+            record = (op, step, 0, 0, 0)
+        elif command.startswith('PLACE '):
+            try:
+                x, y, direction = parse_place(command)
+            except ValueError:
+                texts.append(command)
+                record = (INVALID, step, len(texts) - 1, 0, 0)
+            else:
+                if direction in DIRECTIONS:
+                    heading = DIRECTIONS.index(direction)
+                else:
+                    texts.append(direction)
+                    heading = -len(texts)
+                record = (PLACE, step, x, y, heading)
+        else:
+            texts.append(command)
+            record = (OTHER, step, len(texts) - 1, 0, 0)
+        last = len(code)
+        code.extend(record)
+    return program
+
+
+def compile_stream(commands, chunk: int = 65536):
+    """Compile an iterable of commands lazily, yielding one program per chunk of commands."""
+    commands = iter(commands)
+    start = 0
+    while True:
+        lines = list(islice(commands, chunk))
+        if not lines:
+            return
+        yield compile_commands(lines, start)
+        start += len(lines)
+
+
+def read_commands(path: str):
+    """Commands of a file one line at a time, '-' reads the standard input."""
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        for line in f:
+            yield line.rstrip('\n')
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+@lru_cache(maxsize=64)
+def compile_cached(commands: tuple) -> Program:
+    """Compiled program of a tuple of commands, kept in an LRU cache for replays of the same script."""
+    return compile_commands(commands)
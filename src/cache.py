@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+class RouteCache:
+    """
+    Cache of explored routes keyed by table shape, blocked cells and start cell.
+
+    Routes are kept in an in-memory LRU of at most maxsize entries. When a directory is given they are
+    also stored there, one command file per route, so they survive restarts. The directory keeps at
+    most max_files routes, the least recently used ones are removed first.
+    """
+    # Default location of the on-disk store
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.robot_simulator', 'routes')
+
+    def __init__(self, maxsize: int = 128, directory: str = None, max_files: int = 1024):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_files = max_files
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(grid, *extra) -> str:
+        """Stable hash of a grid: its dimensions, blocked cells and start cell, plus any extra settings."""
+        cells = np.asarray(grid)
+        marked = np.flatnonzero(cells > 0)
+        start = int(marked[0]) if len(marked) else 0
+        digest = hashlib.sha256()
+        digest.update('{}x{}:{}:{}'.format(cells.shape[0], cells.shape[1], start, extra).encode())
+        digest.update(np.packbits(cells < 0).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Commands stored under the key, None if there are none."""
+        commands = self.entries.get(key)
+        if commands is not None:
+            self.entries.move_to_end(key)
+        elif self.directory and os.path.exists(self.path(key)):
+            try:
+                with open(self.path(key), 'r') as f:
+                    commands = f.read().splitlines()
+                # Touch the file so it is evicted last
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                # Evicted by another process sharing the directory
+                commands = None
+            if commands is not None:
+                self.remember(key, commands)
+        if commands is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(commands)
+
+    def put(self, key, commands):
+        """Store the commands under the key."""
+        commands = list(commands)
+        self.remember(key, commands)
+        if self.directory:
+            # A temporary file of its own per write, other processes may write the same key at once
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.writelines(command + '\n' for command in commands)
+                os.replace(tmp, self.path(key))
+            except BaseException:
+                os.remove(tmp)
+                raise
+            self.evict_files()
+
+    def remember(self, key, commands):
+        self.entries[key] = commands
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def evict_files(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.txt')]
+        if len(files) <= self.max_files:
+            return
+        # Files can be removed at any time by other processes sharing the directory
+        dated = []
+        for file in files:
+            try:
+                dated.append((os.path.getmtime(file), file))
+            except FileNotFoundError:
+                pass
+        dated.sort()
+        for _, file in dated[:len(dated) - self.max_files]:
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.txt')
+
+    def clear(self):
+        """Remove every route from memory and disk."""
+        self.entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.txt'):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        """Hit and miss counters of the cache."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class CostModel:
+    """
+    Execution cost of the robot primitives, in seconds.
+
+    A rotation (LEFT or RIGHT) costs turn_time and a MOVE costs move_time, a reversal takes two rotations.
+    The model estimates the execution time of command lists and gives the arc costs of the heading-aware
+    routing model, where node 4 * cell + heading stands for arriving at a cell with a heading.
+    """
+    # Solver costs are integers, times are scaled by this factor
+    SCALE = 100
+
+    def __init__(self, move_time: float = 1.0, turn_time: float = 1.0):
+        self.move_time = move_time
+        self.turn_time = turn_time
+
+    def evaluate(self, commands) -> dict:
+        """Command counts and estimated execution time of a command list."""
+        moves = turns = 0
+        for command in commands:
+            if command == 'MOVE':
+                moves += 1
+            elif command == 'LEFT' or command == 'RIGHT':
+                turns += 1
+        return {
+            'commands': len(commands),
+            'moves': moves,
+            'turns': turns,
+            'time': moves * self.move_time + turns * self.turn_time,
+        }
+
+    def walk_cost(self, moves, turns):
+        """Estimated execution time of a walk."""
+        return moves * self.move_time + turns * self.turn_time
+
+    @staticmethod
+    def rotations(from_heading, to_heading):
+        """Number of rotations between two headings, element-wise for arrays."""
+        diff = (np.asarray(to_heading) - np.asarray(from_heading)) % 4
+        return np.minimum(diff, 4 - diff)
+
+    def heading_row(self, graph, node):
+        """Costs from state node (4 * cell + heading) to every state of the graph."""
+        cell, heading = divmod(int(node), 4)
+        dist = graph.row(cell).astype(np.int64)
+        dx = graph.xs - graph.xs[cell]
+        dy = graph.ys - graph.ys[cell]
+        # Direction of the first step towards each cell, in the order of DIRECTIONS
+        direction = np.where(dy > 0, 0, np.where(dx > 0, 1, np.where(dy < 0, 2, 3)))
+        headings = np.arange(4)
+        arrive = headings[None, :]
+        # Adjacent cells can only be reached by moving straight into them
+        adjacent = (dist == 1)[:, None]
+        aligned = ((dx == 0) | (dy == 0))[:, None]
+        turns = np.where(adjacent,
+                         self.rotations(heading, direction)[:, None],
+                         self.rotations(heading, arrive) + ~aligned)
+        # Cells passed over by a jump are visited again later, so jumps pay their moves twice
+        moves = np.where(adjacent, dist[:, None], 2 * dist[:, None])
+        costs = np.rint((moves * self.move_time + turns * self.turn_time) * self.SCALE).astype(np.int64)
+        impossible = (adjacent & (arrive != direction[:, None])) | (moves >= graph.PENALTY)
+        costs[impossible] = graph.PENALTY * self.SCALE
+        costs[cell, :] = np.where(headings == heading, 0, self.rotations(heading, headings) * self.turn_time
+                                  * self.SCALE)
+        return costs.ravel()
+
+    def register(self, routing, manager, graph):
+        """Register the heading-aware arc costs on a routing model and return the transit callback index."""
+        size = 4 * len(graph)
+        total = manager.GetNumberOfNodes()
+        if total <= graph.MATRIX_LIMIT:
+            matrix = [self.heading_row(graph, node).tolist() + [0] * (total - size) for node in range(size)]
+            matrix.extend([[0] * total for _ in range(total - size)])
+            return routing.RegisterTransitMatrix(matrix)
+        nodes = [manager.IndexToNode(index) for index in range(manager.GetNumberOfIndices())]
+        rows = {}
+
+        def arc_cost(from_index, to_index):
+            from_node, to_node = nodes[from_index], nodes[to_index]
+            if from_node >= size or to_node >= size:
+                return 0
+            row = rows.get(from_node)
+            if row is None:
+                if len(rows) > 64:
+                    rows.clear()
+                row = rows[from_node] = self.heading_row(graph, from_node)
+            return int(row[to_node])
+
+        return routing.RegisterTransitCallback(arc_cost)
@@ -0,0 +1,92 @@
+class CoveragePlanner:
+    """
+    Deterministic boustrophedon coverage of an obstacle-free rectangular table.
+
+    The table is swept column by column from the start cell. The sweep is planned in each of the
+    8 orientations of the table and the walk with the lowest execution cost is kept, which takes
+    O(N) time and revisits at most a border's worth of cells.
+    """
+
+    def __init__(self, cost_model=None):
+        self.cost_model = cost_model
+
+    def solve(self, data):
+        """Plan the route of the single vehicle in data, returns the routes as node ids."""
+        graph = data['graph']
+        if not graph.free.all():
+            raise ValueError('coverage planner only supports tables without blocked cells')
+        sx, sy = data['locations'][data['depot']]
+        walk = self.plan(graph.width, graph.height, sx, sy)
+        return [graph.node_of[[y for _, y in walk], [x for x, _ in walk]].tolist()]
+
+    def plan(self, width, height, sx, sy):
+        """Walk as a list of (x, y) cells covering the table from (sx, sy)."""
+        best, best_cost = None, None
+        for transpose in (False, True):
+            for flip_x in (False, True):
+                for flip_y in (False, True):
+                    w, h = (height, width) if transpose else (width, height)
+                    x, y = (sy, sx) if transpose else (sx, sy)
+                    x = w - 1 - x if flip_x else x
+                    y = h - 1 - y if flip_y else y
+                    walk = self.connect(self.sweep(w, h, x, y))
+                    # Map the walk back to the original orientation
+                    walk = [self.transform(x, y, w, h, transpose, flip_x, flip_y) for x, y in walk]
+                    moves, turns = len(walk) - 1, self.count_turns(walk)
+                    cost = (moves, turns) if self.cost_model is None else \
+                        (self.cost_model.walk_cost(moves, turns), moves)
+                    if best_cost is None or cost < best_cost:
+                        best, best_cost = walk, cost
+        return best
+
+    @staticmethod
+    def transform(x, y, width, height, transpose, flip_x, flip_y):
+        """Map a cell of an oriented table back to the original table."""
+        x = width - 1 - x if flip_x else x
+        y = height - 1 - y if flip_y else y
+        return (y, x) if transpose else (x, y)
+
+    @staticmethod
+    def sweep(width, height, sx, sy):
+        """Order in which the cells are covered, consecutive cells may not be adjacent."""
+        # Start row from the start cell to the west edge
+        order = [(x, sy) for x in range(sx, -1, -1)]
+        # Rows below the start row, columns from west to east
+        for k, x in enumerate(range(width)):
+            ys = range(sy - 1, -1, -1) if k % 2 == 0 else range(0, sy)
+            order.extend((x, y) for y in ys)
+        # Rest of the start row and rows above it, columns from east to west
+        for k, x in enumerate(range(width - 1, -1, -1)):
+            low = sy if x > sx else sy + 1
+            ys = range(low, height) if k % 2 == 0 else range(height - 1, low - 1, -1)
+            order.extend((x, y) for y in ys)
+        return order
+
+    @staticmethod
+    def connect(order):
+        """Insert the cells walked through between non-adjacent consecutive cells."""
+        walk = order[:1]
+        for x, y in order[1:]:
+            xp, yp = walk[-1]
+            while abs(x - xp) + abs(y - yp) > 1:
+                if xp != x:
+                    xp += 1 if x > xp else -1
+                else:
+                    yp += 1 if y > yp else -1
+                walk.append((xp, yp))
+            walk.append((x, y))
+        return walk
+
+    @staticmethod
+    def count_turns(walk):
+        """Number of rotations along a walk starting EAST, a reversal takes two."""
+        turns = 0
+        previous = (1, 0)
+        for i in range(1, len(walk)):
+            step = (walk[i][0] - walk[i - 1][0], walk[i][1] - walk[i - 1][1])
+            if step == (-previous[0], -previous[1]):
+                turns += 2
+            elif step != previous:
+                turns += 1
+            previous = step
+        return turns
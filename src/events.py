@@ -0,0 +1,77 @@
+import json
+import logging
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Logger of the simulator, silent until enable() is called
+log = logging.getLogger('robot_simulator')
+log.addHandler(logging.NullHandler())
+log.propagate = False
+# Above every level, otherwise the level of the root logger applies and disabled warnings are still built
+log.setLevel(logging.CRITICAL + 1)
+
+
+def enable(level=logging.WARNING, stream=None):
+    """Print the events of a level and above, in the '[LEVEL]message' format of the simulator."""
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('[%(levelname)s]%(message)s'))
+    for old in [h for h in log.handlers if isinstance(h, logging.StreamHandler)]:
+        log.removeHandler(old)
+    log.addHandler(handler)
+    log.setLevel(level)
+
+
+class Metrics:
+    """
+    Counters of the simulation events and timings of its phases.
+
+    Counters are named after the event, e.g. 'executed', 'ignored.unplaced', 'ignored.edge' or 'report'.
+    Phases such as 'parse', 'execute', 'solve' and 'render' are timed with the timer() context manager,
+    which adds up the time and the number of calls of each phase. Commands interpreted one by one are
+    parsed while they are executed, so their 'parse' time is also part of 'execute'.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.timings = defaultdict(float)
+        self.calls = Counter()
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    @contextmanager
+    def timer(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] += time.perf_counter() - start
+            self.calls[phase] += 1
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+        self.calls.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'timings': {phase: {'seconds': self.timings[phase], 'calls': self.calls[phase]}
+                        for phase in sorted(self.timings)},
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def summary(self) -> str:
+        """Counters and timings as lines of text."""
+        lines = ['{:<24} {}'.format(name, value) for name, value in sorted(self.counters.items())]
+        lines += ['{:<24} {:.4f}s in {} calls'.format(phase, self.timings[phase], self.calls[phase])
+                  for phase in sorted(self.timings)]
+        return '\n'.join(lines)
+
+
+# Metrics shared by the simulator unless another instance is given
+metrics = Metrics()
@@ -0,0 +1,107 @@
+import copy
+import heapq
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tiling import solve_tile
+
+
+class FleetPlanner:
+    """
+    Coverage of a table by several robots, minimizing the longest route.
+
+    The free cells are split into one connected region per robot, grown from the start cells one cell
+    at a time, the smallest region first, so the regions have about the same size. Each region is then
+    covered on its own by its robot, in a process pool for large tables. With the 'auto' backend rectangular
+    regions are swept, regions larger than a tile are covered by the tiled planner, which runs its own pool,
+    and the others by the greedy planner. Other backends share the search budget of the config between the
+    regions.
+    """
+    # Number of cells above which the regions are solved in a process pool
+    PARALLEL_THRESHOLD = 4096
+    # Number of cells above which 'auto' covers a region with the tiled planner
+    TILED_THRESHOLD = 1024
+
+    def __init__(self, workers: int = None, backend: str = 'auto', config=None):
+        self.workers = workers or os.cpu_count()
+        self.backend = backend
+        # Regions may be solved in other processes, improvements of a region are not streamed
+        self.config = copy.copy(config)
+        if self.config is not None:
+            self.config.callback = None
+
+    def solve(self, data):
+        """Plan the routes of the vehicles in data, returns one route of node ids per vehicle."""
+        graph = data['graph']
+        starts = data['starts']
+        owner = self.partition(graph, starts)
+        routes = [[start] for start in starts]
+        parts, robots = [], []
+        for robot, start in enumerate(starts):
+            region = owner == robot
+            if np.count_nonzero(region) < 2:
+                continue
+            # The region is planned on its bounding box
+            xs, ys = graph.xs[region], graph.ys[region]
+            x0, y0 = int(xs.min()), int(ys.min())
+            cells = np.full((int(ys.max()) - y0 + 1, int(xs.max()) - x0 + 1), -1, dtype=np.int8)
+            cells[ys - y0, xs - x0] = 0
+            cells[graph.ys[start] - y0, graph.xs[start] - x0] = 1
+            backend = self.backend
+            if backend == 'auto':
+                if len(xs) == cells.size:
+                    backend = 'coverage'
+                elif len(xs) > self.TILED_THRESHOLD:
+                    backend = 'tiled'
+                else:
+                    backend = 'greedy'
+            parts.append((cells, (x0, y0), backend))
+            robots.append(robot)
+        tiled = any(backend == 'tiled' for _, _, backend in parts)
+        parallel = self.workers > 1 and len(parts) > 1 and len(graph) > self.PARALLEL_THRESHOLD and not tiled
+        config = self.config
+        if config is not None and len(parts) > 1:
+            # Regions solved at once share the same part of the budget
+            config = copy.copy(config)
+            config.time_limit = config.time_limit * (min(self.workers, len(parts)) if parallel else 1) / len(parts)
+        tasks = [part + (config,) for part in parts]
+        if parallel:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as executor:
+                walks = list(executor.map(solve_tile, *zip(*tasks)))
+        else:
+            walks = [solve_tile(*task) for task in tasks]
+        for robot, walk in zip(robots, walks):
+            routes[robot] = graph.node_of[[y for _, y in walk], [x for x, _ in walk]].tolist()
+        return routes
+
+    @staticmethod
+    def partition(graph, starts):
+        """Robot owning every node, -1 for nodes none of them can reach."""
+        neighbors = graph.neighbors.tolist()
+        owner = [-1] * len(graph)
+        frontiers = []
+        heap = []
+        for robot, start in enumerate(starts):
+            frontiers.append(deque())
+            # Robots sharing a start cell leave it to the first one
+            if owner[start] < 0:
+                owner[start] = robot
+                frontiers[robot].append(start)
+                heap.append((1, robot))
+        heapq.heapify(heap)
+        while heap:
+            size, robot = heapq.heappop(heap)
+            frontier = frontiers[robot]
+            # Claim the next free cell next to the region, in breadth-first order
+            while frontier:
+                node = next((v for v in neighbors[frontier[0]] if v >= 0 and owner[v] < 0), -1)
+                if node >= 0:
+                    owner[node] = robot
+                    frontier.append(node)
+                    heapq.heappush(heap, (size + 1, robot))
+                    break
+                frontier.popleft()
+        return np.array(owner, dtype=np.int32)
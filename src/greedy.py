@@ -0,0 +1,63 @@
+from collections import deque
+
+
+class GreedyPlanner:
+    """
+    Nearest-neighbour coverage of a table with blocked cells, without a solver.
+
+    The robot steps to the adjacent new cell with the fewest new neighbours, keeping straight on ties, so
+    it follows walls and does not leave isolated cells behind. When no adjacent cell is new it walks the
+    shortest path to the nearest new cell, found by a breadth-first search stopping at the first one.
+    Nodes listed in data['optional'] count as covered already, they are only walked through.
+    """
+
+    def solve(self, data):
+        """Plan the route of the single vehicle in data, returns the routes as node ids."""
+        graph = data['graph']
+        neighbors = graph.neighbors.tolist()
+        visited = [False] * len(graph)
+        for node in data.get('optional', ()):
+            visited[node] = True
+        node = data['depot']
+        visited[node] = True
+        walk = [node]
+        # The robot starts facing EAST like in wrap_result
+        heading = 1
+        while True:
+            best, best_key = -1, None
+            for k in (heading, (heading + 1) % 4, (heading + 3) % 4, (heading + 2) % 4):
+                v = neighbors[node][k]
+                if v >= 0 and not visited[v]:
+                    key = (sum(1 for w in neighbors[v] if w >= 0 and not visited[w]), k != heading)
+                    if best_key is None or key < best_key:
+                        best, best_key, best_heading = v, key, k
+            if best >= 0:
+                heading, node = best_heading, best
+                visited[node] = True
+                walk.append(node)
+                continue
+            path = self.nearest(neighbors, visited, node)
+            if path is None:
+                return [walk]
+            walk.extend(path[1:])
+            node = path[-1]
+            visited[node] = True
+            heading = neighbors[path[-2]].index(node)
+
+    @staticmethod
+    def nearest(neighbors, visited, source):
+        """Shortest walk from a node to the nearest node not visited yet, None if there is none."""
+        parent = {source: -1}
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            if not visited[u]:
+                walk = [u]
+                while parent[walk[-1]] >= 0:
+                    walk.append(parent[walk[-1]])
+                return walk[::-1]
+            for v in neighbors[u]:
+                if v >= 0 and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+        return None
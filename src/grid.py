@@ -0,0 +1,202 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+class GridGraph:
+    """
+    4-neighbour graph over the free cells of a rectangular table.
+
+    Cells with a negative value in the grid are excluded. Free cells are numbered in row-major order,
+    the same order used by Router.create_data_model, so node ids can be used as location indexes.
+    Distances are shortest paths over the free cells, computed by BFS one row at a time when first
+    needed and kept in a bounded cache.
+    """
+    # Offsets of the neighbours in the order of DIRECTIONS: NORTH, EAST, SOUTH, WEST
+    OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+    # Cost of an arc between two cells which are not connected
+    PENALTY = 10000
+    # Largest number of nodes for which a full transit matrix is handed to the solver
+    MATRIX_LIMIT = 2000
+    # Memory budget of the distance row cache, in cells
+    CACHE_CELLS = 1 << 26
+
+    def __init__(self, grid):
+        cells = np.asarray(grid)
+        if cells.ndim != 2:
+            raise ValueError('grid should be a rectangular table of cells')
+        self.height, self.width = cells.shape
+        self.free = cells >= 0
+        # Node id of each cell, -1 for excluded cells
+        self.node_of = np.full(cells.shape, -1, dtype=np.int32)
+        self.ys, self.xs = np.nonzero(self.free)
+        self.node_of[self.ys, self.xs] = np.arange(len(self.xs), dtype=np.int32)
+        self.neighbors = self.compute_neighbors()
+        self.adjacency = None
+        self.labels = None
+        self.rows = OrderedDict()
+        self.cache_rows = max(16, self.CACHE_CELLS // max(len(self), 1))
+
+    @classmethod
+    def from_locations(cls, locations):
+        """Build the graph from a list of (x, y) locations, other cells of the bounding box are excluded."""
+        xs = np.fromiter((x for x, _ in locations), dtype=np.int64, count=len(locations))
+        ys = np.fromiter((y for _, y in locations), dtype=np.int64, count=len(locations))
+        grid = np.full((ys.max() + 1 if len(ys) else 0, xs.max() + 1 if len(xs) else 0), -1, dtype=np.int8)
+        grid[ys, xs] = 0
+        graph = cls(grid)
+        if not np.array_equal(graph.node_of[ys, xs], np.arange(len(xs))):
+            raise ValueError('locations should be unique and in row-major order')
+        return graph
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, node):
+        """Distance row of a node, keeps the old distance_matrix[from][to] access working."""
+        return self.row(node)
+
+    def compute_neighbors(self):
+        """Neighbour node ids as a (nodes, 4) array in the order of DIRECTIONS, -1 where there is none."""
+        padded = np.full((self.height + 2, self.width + 2), -1, dtype=np.int32)
+        padded[1:-1, 1:-1] = self.node_of
+        neighbors = np.empty((len(self), 4), dtype=np.int32)
+        for k, (dx, dy) in enumerate(self.OFFSETS):
+            neighbors[:, k] = padded[self.ys + 1 + dy, self.xs + 1 + dx]
+        return neighbors
+
+    def to_csr(self):
+        """Adjacency of the graph in CSR form: (indptr, indices)."""
+        mask = self.neighbors >= 0
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(mask.sum(axis=1), out=indptr[1:])
+        return indptr, self.neighbors[mask]
+
+    def bfs(self, source):
+        """Number of steps from a node to every node over the free cells, -1 where it is unreachable."""
+        if self.adjacency is None:
+            self.adjacency = [[v for v in nbrs if v >= 0] for nbrs in self.neighbors.tolist()]
+        adjacency = self.adjacency
+        dist = [-1] * len(self)
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            d = dist[u] + 1
+            for v in adjacency[u]:
+                if dist[v] < 0:
+                    dist[v] = d
+                    queue.append(v)
+        return np.array(dist, dtype=np.int32)
+
+    def row(self, node):
+        """Distances from a node to every node, PENALTY for unreachable nodes."""
+        node = int(node)
+        row = self.rows.get(node)
+        if row is None:
+            row = self.bfs(node)
+            row[row < 0] = self.PENALTY
+            self.rows[node] = row
+            if len(self.rows) > self.cache_rows:
+                self.rows.popitem(last=False)
+        else:
+            self.rows.move_to_end(node)
+        return row
+
+    def distance(self, from_node, to_node):
+        """Distance between two nodes."""
+        return int(self.row(from_node)[to_node])
+
+    def components(self):
+        """
+        Connected component of every node, as the smallest node id of the component.
+
+        Every arc hooks the root of the larger component under the smaller one, then every node is pointed at
+        its root by pointer jumping, until no arc joins two components. A few passes of array operations
+        label a whole table.
+        """
+        if self.labels is None:
+            # Arcs to the NORTH and EAST neighbours, each arc once
+            us = np.concatenate([np.flatnonzero(self.neighbors[:, k] >= 0) for k in (0, 1)])
+            vs = np.concatenate([self.neighbors[self.neighbors[:, k] >= 0, k] for k in (0, 1)])
+            parent = np.arange(len(self), dtype=np.int32)
+            while True:
+                pu, pv = parent[us], parent[vs]
+                joined = pu != pv
+                if not joined.any():
+                    break
+                us, vs, pu, pv = us[joined], vs[joined], pu[joined], pv[joined]
+                np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+                while True:
+                    grandparent = parent[parent]
+                    if np.array_equal(grandparent, parent):
+                        break
+                    parent = grandparent
+            self.labels = parent
+        return self.labels
+
+    def reachable(self, node):
+        """Mask of the nodes reachable from a node."""
+        labels = self.components()
+        return labels == labels[node]
+
+    def path(self, from_node, to_node):
+        """Shortest walk between two nodes as a list of node ids, keeping straight where possible."""
+        dist = self.row(to_node)
+        if dist[from_node] >= self.PENALTY:
+            raise ValueError('node {} can not be reached from node {}'.format(to_node, from_node))
+        walk = [from_node]
+        heading = -1
+        node = from_node
+        while node != to_node:
+            nbrs = self.neighbors[node]
+            # Try the current heading first, then the others
+            for k in ([heading] if heading >= 0 else []) + [0, 1, 2, 3]:
+                v = nbrs[k]
+                if v >= 0 and dist[v] == dist[node] - 1:
+                    heading, node = k, int(v)
+                    break
+            walk.append(node)
+        return walk
+
+    def expand(self, route):
+        """Turn a route of nodes into the cell-by-cell walk visiting them in order."""
+        walk = list(route[:1])
+        for node in route[1:]:
+            if node == walk[-1]:
+                continue
+            if node in self.neighbors[walk[-1]]:
+                walk.append(node)
+            else:
+                walk.extend(self.path(walk[-1], node)[1:])
+        return walk
+
+    def matrix(self):
+        """Full distance matrix as nested lists, only meant for small graphs."""
+        return [self.row(node).tolist() for node in range(len(self))]
+
+    def register(self, routing, manager):
+        """
+        Register the arc costs on a routing model and return the transit callback index.
+
+        Nodes of the manager beyond the graph are free ends: arcs from or to them cost nothing.
+        """
+        size = len(self)
+        if manager.GetNumberOfNodes() <= self.MATRIX_LIMIT:
+            # Evaluated inside the solver, no Python call per arc
+            matrix = self.matrix()
+            for row in matrix:
+                row.extend([0] * (manager.GetNumberOfNodes() - size))
+            matrix.extend([[0] * manager.GetNumberOfNodes() for _ in range(manager.GetNumberOfNodes() - size)])
+            return routing.RegisterTransitMatrix(matrix)
+        # Resolve routing indexes once so the callback is plain list lookups
+        nodes = [manager.IndexToNode(index) for index in range(manager.GetNumberOfIndices())]
+        row = self.row
+
+        def arc_cost(from_index, to_index):
+            from_node, to_node = nodes[from_index], nodes[to_index]
+            if from_node >= size or to_node >= size:
+                return 0
+            return int(row(from_node)[to_node])
+
+        return routing.RegisterTransitCallback(arc_cost)
@@ -0,0 +1,142 @@
+import mmap
+
+import numpy as np
+
+# Header of a map file: format of the cells, table size and number of listed cells
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('format', '<u4'), ('length', '<u8'), ('width', '<u8'),
+                   ('count', '<u8')])
+MAGIC = b'ROBOTMAP'
+VERSION = 1
+# Formats of the blocked cells: a bitmap of the table, or the (x, y) of every blocked cell
+BITMAP, SPARSE = 0, 1
+# Offsets of a MOVE in the order of DIRECTIONS
+OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+# Number of set bits of every byte
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+class ObstacleMap:
+    """
+    Blocked cells of a table, as a bitmap with a row of bits per y and bit x % 8 of byte x // 8 for x.
+
+    Maps are saved either as the bitmap, read back as a view of the memory-mapped file, or as the list
+    of blocked cells when it is smaller, which is unpacked into a bitmap. np.asarray(obstacles) is the
+    grid of the router: -1 for blocked cells, 0 for free ones.
+    """
+
+    def __init__(self, length: int, width: int, bits=None):
+        self.length = length
+        self.width = width
+        self.bits = bits if bits is not None else np.zeros((width, (length + 7) // 8), dtype=np.uint8)
+        self.map = None
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Map of the negative cells of a router grid."""
+        blocked = np.asarray(grid) < 0
+        return cls(blocked.shape[1], blocked.shape[0], np.packbits(blocked, axis=1, bitorder='little'))
+
+    @classmethod
+    def from_cells(cls, length: int, width: int, xs, ys):
+        """Map of a table with the blocked cells of coordinates xs and ys."""
+        obstacles = cls(length, width)
+        obstacles.block(xs, ys)
+        return obstacles
+
+    @classmethod
+    def load(cls, path: str):
+        """Map saved by save(), a bitmap is a read-only view of the file mapped into memory."""
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.frombuffer(data[:HEADER.itemsize], dtype=HEADER)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            data.close()
+            raise ValueError('{} is not a map file of version {}'.format(path, VERSION))
+        length, width, count = int(header['length']), int(header['width']), int(header['count'])
+        if header['format'] == SPARSE:
+            cells = np.frombuffer(data, dtype='<u4', count=2 * count, offset=HEADER.itemsize).reshape(-1, 2)
+            obstacles = cls.from_cells(length, width, cells[:, 0], cells[:, 1])
+            del cells
+            data.close()
+            return obstacles
+        bits = np.frombuffer(data, dtype=np.uint8, count=width * ((length + 7) // 8), offset=HEADER.itemsize)
+        obstacles = cls(length, width, bits.reshape(width, -1))
+        obstacles.map = data
+        return obstacles
+
+    def save(self, path: str, sparse: bool = None):
+        """Save the map, as the list of blocked cells when it is smaller than the bitmap unless sparse is given."""
+        count = self.count()
+        if sparse is None:
+            sparse = count * 8 < self.bits.size
+        header = np.array([(MAGIC, VERSION, SPARSE if sparse else BITMAP, self.length, self.width,
+                            count if sparse else 0)], dtype=HEADER)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            if sparse:
+                xs, ys = self.cells()
+                f.write(np.column_stack((xs, ys)).astype('<u4').tobytes())
+            else:
+                f.write(np.ascontiguousarray(self.bits).tobytes())
+
+    def __array__(self, dtype=None, copy=None):
+        grid = -self.to_array().view(np.int8)
+        return grid if dtype is None else grid.astype(dtype)
+
+    @property
+    def shape(self):
+        return self.width, self.length
+
+    def block(self, xs, ys):
+        """Block cells of coordinates xs and ys."""
+        if not self.bits.flags.writeable:
+            self.bits = self.bits.copy()
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        np.bitwise_or.at(self.bits, (ys, xs >> 3), (1 << (xs & 7)).astype(np.uint8))
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        """Whether a cell of the table is blocked, a single bit test."""
+        return bool(self.bits[y, x >> 3] >> (x & 7) & 1)
+
+    def free_run(self, x: int, y: int, heading: int, count: int) -> int:
+        """Number of free cells in a row from (x, y), excluded, in a heading, up to count cells of the table."""
+        dx, dy = OFFSETS[heading]
+        if count == 1:
+            return 0 if self.is_blocked(x + dx, y + dy) else 1
+        if dx:
+            x0, x1 = (x + 1, x + count + 1) if dx > 0 else (x - count, x)
+            row = np.unpackbits(self.bits[y, x0 >> 3:(x1 + 7) >> 3], bitorder='little')[x0 & 7:(x0 & 7) + x1 - x0]
+            blocked = np.flatnonzero(row if dx > 0 else row[::-1])
+        else:
+            y0, y1 = (y + 1, y + count + 1) if dy > 0 else (y - count, y)
+            column = self.bits[y0:y1, x >> 3] >> (x & 7) & 1
+            blocked = np.flatnonzero(column if dy > 0 else column[::-1])
+        return int(blocked[0]) if len(blocked) else count
+
+    def count(self) -> int:
+        """Number of blocked cells, the bits past the end of the rows are never set."""
+        return int(np.take(POPCOUNT, self.bits).sum(dtype=np.int64))
+
+    def cells(self):
+        """Coordinates xs, ys of the blocked cells, in row-major order."""
+        ys, xs = np.nonzero(self.to_array())
+        return xs, ys
+
+    def to_array(self):
+        """Boolean (width, length) array of the blocked cells."""
+        return np.unpackbits(self.bits, axis=1, count=self.length, bitorder='little').view(bool)
+
+    def grid(self, starts=()):
+        """Grid of the router with the start cells marked."""
+        grid = np.asarray(self)
+        for x, y in starts:
+            grid[y, x] = 1
+        return grid
+
+    def close(self):
+        """Release the mapped file of a loaded bitmap, the map is empty afterwards."""
+        if self.map is not None:
+            self.bits = np.zeros((self.width, (self.length + 7) // 8), dtype=np.uint8)
+            self.map.close()
+            self.map = None
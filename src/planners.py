@@ -0,0 +1,82 @@
+import importlib
+import importlib.util
+
+
+class SolverPlanner:
+    """OR-Tools backend of a router, the arcs of the solver are expanded into cell-by-cell walks."""
+
+    def __init__(self, router, heading: bool = False):
+        self.router = router
+        self.heading = heading
+
+    def solve(self, data):
+        """Plan the routes of the vehicles in data, returns the routes as node ids."""
+        routes = self.router.solve_tsp(data, heading=self.heading)
+        return [data['graph'].expand(route) for route in routes]
+
+
+def coverage_planner(router):
+    from coverage import CoveragePlanner
+    return CoveragePlanner(router.cost_model)
+
+
+def tiled_planner(router):
+    from tiling import TiledPlanner
+    return TiledPlanner(config=router.config)
+
+
+def greedy_planner(router):
+    from greedy import GreedyPlanner
+    return GreedyPlanner()
+
+
+def ortools_planner(router):
+    return SolverPlanner(router)
+
+
+def heading_planner(router):
+    return SolverPlanner(router, heading=True)
+
+
+# Planners by name. A planner is created by a factory called with the router, either a callable or the
+# 'module:attribute' of one which is imported when the planner is first used. The planner's solve(data)
+# returns the routes as node ids
+PLANNERS = {
+    'coverage': 'planners:coverage_planner',
+    'ortools': 'planners:ortools_planner',
+    'tiled': 'planners:tiled_planner',
+    'heading': 'planners:heading_planner',
+    'greedy': 'planners:greedy_planner',
+}
+# Module each planner needs, planners whose module is not installed are not available
+REQUIRES = {'ortools': 'ortools', 'heading': 'ortools'}
+# Planners solving the routes of several vehicles at once, the others cover one region per vehicle. The solver
+# backends are not among them: with a first solution only, the span cost of solve_tsp does not balance the routes
+MULTI_VEHICLE = set()
+
+
+def register(name: str, factory, requires: str = None, multi_vehicle: bool = False):
+    """Register a planner under a name, factory is a callable or its 'module:attribute'."""
+    PLANNERS[name] = factory
+    if requires:
+        REQUIRES[name] = requires
+    if multi_vehicle:
+        MULTI_VEHICLE.add(name)
+
+
+def names() -> [str]:
+    return list(PLANNERS)
+
+
+def available(name: str) -> bool:
+    """Whether a planner is registered and the module it needs is installed, without importing it."""
+    return name in PLANNERS and (name not in REQUIRES or importlib.util.find_spec(REQUIRES[name]) is not None)
+
+
+def create(name: str, router):
+    """Planner registered under a name for a router, its factory is imported on first use."""
+    factory = PLANNERS[name]
+    if isinstance(factory, str):
+        module, attribute = factory.split(':')
+        factory = PLANNERS[name] = getattr(importlib.import_module(module), attribute)
+    return factory(router)
@@ -0,0 +1,156 @@
+import time
+from itertools import islice
+
+
+class Playback:
+    """
+    Frame-driven replay of actions, scheduled with the after() callbacks of a Tk widget.
+
+    Every frame applies as many actions as the speed allows and the view is drawn once, so the event loop
+    stays responsive at any speed. Actions are read lazily from source(), which gives a new iterator of them
+    every time it is called. Only the state of the view every KEYFRAME actions is kept, seeking backwards
+    restores a keyframe and reads the source again up to it, so memory does not grow with the actions.
+
+    The view provides apply(action), snapshot(), restore(state) and redraw(), it can tell from replaying
+    whether the actions read or applied have been seen before.
+    """
+    # Time between two frames, in milliseconds
+    FRAME = 16
+    # Largest number of actions applied in a frame, when seeking or jumping to the end
+    BATCH = 5000
+    # Number of actions between two recorded states
+    KEYFRAME = 256
+
+    def __init__(self, widget, view, source, speed: float = 30, total: int = None, on_frame=None, on_end=None):
+        self.widget = widget
+        self.view = view
+        self.source = source
+        self.actions = iter(source())
+        # State before every KEYFRAME-th action
+        self.keyframes = []
+        self.position = 0
+        # Number of actions applied at least once, and whether the current one is applied again
+        self.known = 0
+        self.replaying = False
+        # Actions per second
+        self.speed = speed
+        self.total = total
+        self.paused = True
+        self.exhausted = False
+        # Position to reach as fast as possible, None when playing at speed
+        self.target = None
+        self.job = None
+        self.credit = 0.0
+        self.last = None
+        self.on_frame = on_frame
+        self.on_end = on_end
+
+    def __len__(self):
+        """Number of actions, as far as they are known."""
+        return max(self.total or 0, self.known)
+
+    @property
+    def finished(self):
+        return self.exhausted and self.position >= self.known
+
+    def play(self):
+        """Play at speed from the current position."""
+        self.paused = False
+        self.target = None
+        self.schedule()
+
+    def pause(self):
+        self.paused = True
+        self.target = None
+        self.cancel()
+
+    def toggle(self):
+        if self.paused:
+            self.play()
+        else:
+            self.pause()
+
+    def step(self):
+        """Pause and apply the next action."""
+        self.pause()
+        self.advance(1)
+        self.draw()
+        if self.finished and self.on_end:
+            self.on_end(self)
+
+    def seek(self, position: int):
+        """Move to a position, backwards at once and forwards over as many frames as needed."""
+        position = max(position, 0)
+        if position < self.position:
+            keyframe = position // self.KEYFRAME
+            self.view.restore(self.keyframes[keyframe])
+            self.position = keyframe * self.KEYFRAME
+            # Read the source again up to the keyframe
+            self.replaying = True
+            self.actions = iter(self.source())
+            next(islice(self.actions, self.position, self.position), None)
+        self.target = position
+        if self.position < position:
+            self.schedule()
+        else:
+            self.draw()
+
+    def end(self):
+        """Jump to the end, the remaining actions are applied in batches so the window stays responsive."""
+        self.seek(float('inf'))
+
+    def advance(self, count) -> int:
+        """Apply up to count actions, returns the number applied."""
+        for i in range(count):
+            self.replaying = self.position < self.known
+            action = next(self.actions, None)
+            if action is None:
+                self.exhausted = True
+                return i
+            if self.position % self.KEYFRAME == 0 and self.position // self.KEYFRAME == len(self.keyframes):
+                self.keyframes.append(self.view.snapshot())
+            self.view.apply(action)
+            self.position += 1
+            if self.position > self.known:
+                self.known = self.position
+        return count
+
+    def schedule(self):
+        if self.job is None:
+            self.last = time.perf_counter()
+            self.credit = 0.0
+            self.job = self.widget.after(self.FRAME, self.tick)
+
+    def cancel(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def tick(self):
+        """Apply the actions of a frame, draw and schedule the next frame."""
+        self.job = None
+        if self.target is not None:
+            count = int(min(self.BATCH, self.target - self.position))
+        else:
+            now = time.perf_counter()
+            self.credit = min(self.credit + self.speed * (now - self.last), self.BATCH)
+            self.last = now
+            count = int(self.credit)
+            self.credit -= count
+        if count > 0 and self.advance(count) < count and self.target is not None:
+            self.target = None
+            self.paused = True
+        if self.target is not None and self.position >= self.target:
+            self.target = None
+        self.draw()
+        if not self.finished and (self.target is not None or not self.paused):
+            self.job = self.widget.after(self.FRAME, self.tick)
+            return
+        self.paused = True
+        if self.finished and self.on_end:
+            self.on_end(self)
+
+    def draw(self):
+        self.view.redraw()
+        if self.on_frame:
+            self.on_frame(self)
@@ -1,4 +1,11 @@
+import argparse
+import logging
 import sys
+from itertools import islice
+
+import events
+from bytecode import DIRECTIONS, INVALID, LEFT, MOVE, OTHER, PLACE, REPORT, RIGHT, Program, parse_place, read_commands
+from events import log
 
 
 class Robot:
@@ -6,101 +13,236 @@ class Robot:
     Robot class
     """
     # Available directions
-    DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+    DIRECTIONS = DIRECTIONS
+    # Offsets of a MOVE in the order of DIRECTIONS
+    OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
 
-    # Constructor with default table length and width
-    def __init__(self, length: int = 5, width: int = 5):
+    # Constructor with default table length and width, events are counted in metrics, the states are
+    # recorded by the TraceWriter recorder if there is one and the blocked cells are given by an ObstacleMap
+    def __init__(self, length: int = 5, width: int = 5, metrics: events.Metrics = None, recorder=None,
+                 obstacles=None):
+        self.metrics = metrics or events.metrics
+        self.recorder = recorder
+        self.obstacles = obstacles
         self.x = None
         self.y = None
-        self.direction = None
+        # Index of the direction in DIRECTIONS
+        self.heading = None
         self.length = length
         self.width = width
         self.step = 0
         self.placed = False
+        # File the REPORT lines are printed to, None for the standard output
+        self.output = None
+
+    # Direction of the robot as a string
+    @property
+    def direction(self):
+        return None if self.heading is None else self.DIRECTIONS[self.heading]
+
+    @direction.setter
+    def direction(self, direction):
+        self.heading = None if direction is None else self.DIRECTIONS.index(direction)
 
     # Place the robot on the table, x and y should be the available position
     def place(self, x: int, y: int, direction: str):
         if not self.is_valid_position(x, y) or direction not in self.DIRECTIONS:
-            print('[WARNING]ignore "PLACE" command due to wrong position at step {}: {},{},{}'
-                  .format(self.step, x, y, direction))
+            self.metrics.counters['ignored.place'] += 1
+            log.warning('ignore "PLACE" command due to wrong position at step %s: %s,%s,%s', self.step, x, y, direction)
             return
+        self.metrics.counters['executed'] += 1
         self.placed = True
         self.x = x
         self.y = y
         self.direction = direction
+        if self.recorder:
+            self.recorder.record_place(self.step, x, y, self.heading)
 
-    # Move the robot to the next position
-    def move(self):
-        if self.direction == 'NORTH' and self.is_valid_position(self.x, self.y + 1):
-            self.y += 1
-        elif self.direction == 'EAST' and self.is_valid_position(self.x + 1, self.y):
-            self.x += 1
-        elif self.direction == 'SOUTH' and self.is_valid_position(self.x, self.y - 1):
-            self.y -= 1
-        elif self.direction == 'WEST' and self.is_valid_position(self.x - 1, self.y):
-            self.x -= 1
-        else:
-            print('[WARNING]ignore "MOVE" command at step {}: {},{},{}'.format(
-                self.step + 1, self.x, self.y, self.direction))
+    # Move the robot forward by count positions, stopping at the edge of the table or before a blocked cell
+    def move(self, count: int = 1):
+        moved = blocked = 0
+        heading = self.heading
+        if heading is not None:
+            # Number of positions left before the edge, the robot is always on the table
+            if heading == 0:
+                room = self.width - 1 - self.y
+            elif heading == 1:
+                room = self.length - 1 - self.x
+            else:
+                room = self.y if heading == 2 else self.x
+            moved = count if count < room else room
+            if self.obstacles is not None and moved:
+                free = self.obstacles.free_run(self.x, self.y, heading, moved)
+                # The robot stops facing the blocked cell, the remaining moves are all blocked by it
+                blocked = count - free if free < moved else 0
+                moved = free
+            if moved:
+                if self.recorder:
+                    self.recorder.record_moves(self.step, self.x, self.y, heading, moved)
+                dx, dy = self.OFFSETS[heading]
+                self.x += dx * moved
+                self.y += dy * moved
+        self.metrics.counters['executed'] += moved
+        if moved < count:
+            counters = self.metrics.counters
+            if blocked:
+                counters['ignored.obstacle'] += blocked
+            else:
+                counters['ignored.edge'] += count - moved
+            if log.isEnabledFor(logging.WARNING):
+                for i in range(moved, count):
+                    log.warning('ignore "MOVE" command at step %s: %s,%s,%s', self.step + 1 + i, self.x, self.y,
+                                self.direction)
 
     # Rotate the robot to the left
     def left(self):
-        if self.direction is not None:
-            index = (self.DIRECTIONS.index(self.direction) - 1) % 4
-            self.direction = self.DIRECTIONS[index]
+        if self.heading is not None:
+            self.heading = (self.heading - 1) % 4
+            self.metrics.counters['executed'] += 1
+            if self.recorder:
+                self.recorder.record_turn(self.step, self.x, self.y, self.heading)
 
     # Rotate the robot to the right
     def right(self):
-        if self.direction is not None:
-            index = (self.DIRECTIONS.index(self.direction) + 1) % 4
-            self.direction = self.DIRECTIONS[index]
+        if self.heading is not None:
+            self.heading = (self.heading + 1) % 4
+            self.metrics.counters['executed'] += 1
+            if self.recorder:
+                self.recorder.record_turn(self.step, self.x, self.y, self.heading)
 
     # Report the current position and direction of the robot
     def report(self):
         if self.direction is not None:
-            print(self.x, self.y, self.direction)
+            self.metrics.counters['executed'] += 1
+            self.metrics.counters['report'] += 1
+            if self.recorder:
+                self.recorder.record_report(self.step, self.x, self.y, self.heading)
+            print(self.x, self.y, self.direction, file=self.output)
 
-    # Check if the position is valid
+    # Check if the position is valid, on the table and not blocked
     def is_valid_position(self, x, y):
-        return 0 <= x < self.length and 0 <= y < self.width
+        if not (0 <= x < self.length and 0 <= y < self.width):
+            return False
+        return self.obstacles is None or not self.obstacles.is_blocked(x, y)
 
-    # Process the commands
+    # Process the commands, either a list of strings, run one by one, or a compiled program
     def process_commands(self, commands: [str]):
-        for i, command in enumerate(commands):
-            self.step = i
-            if not self.placed and not command.startswith('PLACE '):
-                print('[WARNING]ignore "{}" command at step {}: please provide available PLACE command at first.'
-                      .format(command, i + 1))
-                continue
-            if command.startswith('PLACE '):
-                x, y, direction = command[6:].split(',')
-                self.place(int(x), int(y), direction)
-            elif command == 'MOVE':
-                self.move()
-            elif command == 'LEFT':
-                self.left()
-            elif command == 'RIGHT':
-                self.right()
-            elif command == 'REPORT':
-                self.report()
+        if isinstance(commands, Program):
+            self.execute(commands)
+        else:
+            self.interpret(commands)
+
+    # Process the commands of an iterable, such as the lines of a file, with bounded memory
+    def process_stream(self, commands, chunk: int = 65536):
+        commands = iter(commands)
+        start = 0
+        while True:
+            with self.metrics.timer('parse'):
+                lines = list(islice(commands, chunk))
+            if not lines:
+                return
+            self.interpret(lines, start)
+            start += len(lines)
+
+    # Run command strings one by one with the rules of execute, compiling a script once costs as much as running it
+    def interpret(self, commands: [str], start: int = 0):
+        counters = self.metrics.counters
+        actions = {'MOVE': self.move, 'LEFT': self.left, 'RIGHT': self.right, 'REPORT': self.report}
+        with self.metrics.timer('execute'):
+            for step, command in enumerate(commands, start):
+                self.step = step
+                action = actions.get(command)
+                if action is not None and self.placed:
+                    action()
+                elif command.startswith('PLACE '):
+                    with self.metrics.timer('parse'):
+                        x, y, direction = parse_place(command)
+                    self.place(x, y, direction)
+                elif self.placed:
+                    counters['ignored.unknown'] += 1
+                else:
+                    counters['ignored.unplaced'] += 1
+                    if log.isEnabledFor(logging.WARNING):
+                        log.warning('ignore "%s" command at step %s: please provide available PLACE command at first.',
+                                    command, step + 1)
+
+    # Execute a compiled program
+    def execute(self, program: Program):
+        counters = self.metrics.counters
+        with self.metrics.timer('execute'):
+            for op, step, a, b, c in program:
+                self.step = step
+                if op == INVALID:
+                    # Raise the error of parsing the command
+                    parse_place(program.texts[a])
+                if not self.placed and op != PLACE:
+                    counters['ignored.unplaced'] += a if op == MOVE else 1
+                    if log.isEnabledFor(logging.WARNING):
+                        command = program.command(op, a, b, c)
+                        for i in range(a if op == MOVE else 1):
+                            log.warning('ignore "%s" command at step %s: please provide available PLACE command at '
+                                        'first.', command, step + i + 1)
+                    self.step = step + a - 1 if op == MOVE else step
+                    continue
+                if op == PLACE:
+                    self.place(a, b, self.DIRECTIONS[c] if c >= 0 else program.texts[-1 - c])
+                elif op == MOVE:
+                    self.move(a)
+                    self.step = step + a - 1
+                elif op == LEFT:
+                    self.left()
+                elif op == RIGHT:
+                    self.right()
+                elif op == REPORT:
+                    self.report()
+                elif op == OTHER:
+                    counters['ignored.unknown'] += 1
 
 
 # Main function
 def main():
+    parser = argparse.ArgumentParser(description='Toy Robot Simulator')
+    parser.add_argument('commands', nargs='*', help='commands to run, "-" reads them from the standard input')
+    parser.add_argument('-f', '--file', help='file of commands to run, "-" for the standard input')
+    parser.add_argument('-s', '--size', default='5,5', help='table length and width, default: 5,5')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the ignored commands')
+    parser.add_argument('--metrics', action='store_true', help='print the event counters and timings to stderr')
+    parser.add_argument('--metrics-json', metavar='FILE', help='write the event counters and timings to a JSON file')
+    parser.add_argument('--trace', metavar='FILE', help='record the states of the robot into a binary trace file')
+    parser.add_argument('--map', metavar='FILE', help='obstacle map of the table, its size replaces --size')
+    args = parser.parse_args()
+    if args.verbose:
+        events.enable(logging.WARNING)
     # Default table length and width
-    robot = Robot(length=5, width=5)
-    # Process the commands
-    if len(sys.argv) > 1:
-        if sys.argv[1] == '-f' and len(sys.argv) == 3:
-            file = sys.argv[2]
-            with open(file, 'r') as f:
-                commands = f.read().splitlines()
-        else:
-            commands = sys.argv[1:]
-        robot.process_commands(commands)
+    length, width = (int(v) for v in args.size.split(','))
+    obstacles = None
+    if args.map:
+        from obstacles import ObstacleMap
+        obstacles = ObstacleMap.load(args.map)
+        length, width = obstacles.length, obstacles.width
+    recorder = None
+    if args.trace:
+        from tracefile import TraceWriter
+        recorder = TraceWriter(args.trace, length, width)
+    robot = Robot(length=length, width=width, recorder=recorder, obstacles=obstacles)
+    # Process the commands, files and pipes are streamed
+    if args.file:
+        robot.process_stream(read_commands(args.file))
+    elif args.commands == ['-'] or (not args.commands and not sys.stdin.isatty()):
+        robot.process_stream(read_commands('-'))
+    elif args.commands:
+        robot.process_commands(args.commands)
     else:
         print('[WARNING]No command provided. Call the script like this: "python robot.py -f a.txt"\n'
-              'or this: "python robot.py \"PLACE 2,2,EAST\" RIGHT MOVE REPORT"')
+              'or this: "python robot.py \"PLACE 2,2,EAST\" RIGHT MOVE REPORT"\n'
+              'or pipe the commands: "python routing.py 10,10 | python robot.py -s 10,10"')
+    if recorder:
+        recorder.close()
+    if args.metrics:
+        print(robot.metrics.summary(), file=sys.stderr)
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as f:
+            f.write(robot.metrics.to_json(indent=2))
 
 
 if __name__ == '__main__':
@@ -1,7 +1,49 @@
+import argparse
+import copy
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
 import tkinter as tk
 from tkinter.filedialog import askopenfilename
 
+import numpy as np
+
+import events
+from bytecode import (INVALID, LEFT, MOVE, OTHER, PLACE, REPORT, RIGHT, Program, compile_cached, compile_stream,
+                      parse_place, read_commands)
+from cache import RouteCache
+from events import log, metrics
+from obstacles import OFFSETS, ObstacleMap
+from playback import Playback
 from routing import Router
+from tracefile import TraceReader
+
+# Color of the blocked cells
+OBSTACLE_COLOR = (64, 64, 64)
+# Canvas tag of the image of the blocked cells
+OBSTACLE_TAG = 'obstacles'
+
+
+def explore_table(grid, router, messages):
+    """Explore a table in a worker process, the objective of every improved route and the commands go to messages."""
+    signal.signal(signal.SIGTERM, stop_exploration)
+    router.config = copy.copy(router.config)
+    router.config.callback = lambda objective, elapsed, routes: messages.put(('progress', objective))
+    try:
+        messages.put(('done', router.solve(grid)))
+    except Exception as e:
+        messages.put(('error', '{}: {}'.format(type(e).__name__, e)))
+
+
+def stop_exploration(signum, frame):
+    """Stop an exploration worker terminated by Cancel, with the solver processes of tiles and fleets it started."""
+    for child in multiprocessing.active_children():
+        child.terminate()
+    os._exit(1)
 
 
 class Robot:
@@ -24,13 +66,13 @@ class Robot:
         d = self.direction
         index = (self.DIRECTIONS.index(self.direction) - 1) % 4
         self.direction = self.DIRECTIONS[index]
-        print('{}->left->{}'.format(d, self.direction))
+        log.debug('%s->left->%s', d, self.direction)
 
     def right(self):
         d = self.direction
         index = (self.DIRECTIONS.index(self.direction) + 1) % 4
         self.direction = self.DIRECTIONS[index]
-        print('{}->right->{}'.format(d, self.direction))
+        log.debug('%s->right->%s', d, self.direction)
 
     def move(self):
         x, y = self.x, self.y
@@ -42,7 +84,96 @@ class Robot:
             self.y -= 1
         elif self.direction == 'WEST':
             self.x -= 1
-        print('({},{})->({},{})'.format(x, y, self.x, self.y))
+        log.debug('(%s,%s)->(%s,%s)', x, y, self.x, self.y)
+
+
+class Trace:
+    """
+    Path of the robot drawn as polylines through the centers of the cells it visits.
+
+    Points are added to the last polyline, which is redrawn by flush(), and a polyline holds at most CHUNK
+    points so the cost of a frame does not grow with the length of the trace. break_path() starts a new
+    polyline, e.g. when the robot is placed somewhere else.
+    """
+    # Largest number of points of a polyline
+    CHUNK = 256
+
+    def __init__(self, canvas, fill="gray", width=3):
+        self.canvas = canvas
+        self.fill = fill
+        self.width = width
+        # Polylines as [canvas item or None, coordinates, number of points added to it]
+        self.lines = []
+        self.points = 0
+        self.broken = True
+        self.dirty = set()
+
+    def __len__(self):
+        return self.points
+
+    def add(self, x, y):
+        if self.broken or self.lines[-1][2] >= self.CHUNK:
+            # A new polyline carries on from the last point unless the path is broken
+            coords = [] if self.broken else self.lines[-1][1][-2:]
+            self.lines.append([None, coords, 0])
+        line = self.lines[-1]
+        line[1].extend((x, y))
+        line[2] += 1
+        self.points += 1
+        self.broken = False
+        self.dirty.add(len(self.lines) - 1)
+
+    def break_path(self):
+        self.broken = True
+
+    def flush(self):
+        """Draw the polylines changed since the last flush."""
+        for index in self.dirty:
+            if index >= len(self.lines):
+                continue
+            line = self.lines[index]
+            if len(line[1]) < 4:
+                if line[0] is not None:
+                    self.canvas.delete(line[0])
+                    line[0] = None
+            elif line[0] is None:
+                line[0] = self.canvas.create_line(*line[1], fill=self.fill, width=self.width)
+                # Keep the trace under the grid and the robot, above the opaque image of the blocked cells
+                self.canvas.tag_lower(line[0])
+                if self.canvas.find_withtag(OBSTACLE_TAG):
+                    self.canvas.tag_raise(line[0], OBSTACLE_TAG)
+            else:
+                self.canvas.coords(line[0], *line[1])
+        self.dirty.clear()
+
+    def state(self):
+        return self.points, self.broken
+
+    def restore(self, state):
+        """Remove the points added after a state."""
+        points, broken = state
+        while self.points > points:
+            line = self.lines[-1]
+            remove = min(line[2], self.points - points)
+            line[2] -= remove
+            self.points -= remove
+            del line[1][len(line[1]) - 2 * remove:]
+            if line[2] == 0:
+                if line[0] is not None:
+                    self.canvas.delete(line[0])
+                self.lines.pop()
+            else:
+                self.dirty.add(len(self.lines) - 1)
+        self.broken = broken or not self.lines
+
+    def clear(self):
+        for line in self.lines:
+            if line[0] is not None:
+                self.canvas.delete(line[0])
+        self.lines = []
+        self.points = 0
+        self.broken = True
+        self.dirty.clear()
 
 
 class RobotGUI(Robot):
@@ -51,7 +182,8 @@ class RobotGUI(Robot):
         super().__init__()
         self.cw = 600
         self.ch = 600
-        self.delay = 30
+        # Replay speed in steps per second
+        self.speed = 30
         self.s = int(self.cw / max(width, height))
         self.pad = 5
         self.width = width
@@ -60,53 +192,71 @@ class RobotGUI(Robot):
         self.canvas = None
         self.robot = None
         self.canvas_lines = []
+        # Obstacle map of the table and its image on the canvas
+        self.obstacles = None
+        self.obstacle_image = None
+        self.obstacle_item = None
         self.log_trace = False
-        self.trace = []
+        self.trace = None
+        self.playback = None
+        # Worker process, messages, start time and cache key of the running exploration
+        self.exploration = None
+        self.router = Router(cache=RouteCache(directory=RouteCache.DEFAULT_DIRECTORY))
         self.init_canvas()
         self.create_buttons()
         # bind keyboard event
         self.root.bind('<Left>', self.left)
         self.root.bind('<Right>', self.right)
         self.root.bind('<Up>', self.move)
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
 
-    def draw_robot(self):
-        """draw robot on canvas"""
+    def robot_points(self):
+        """corners of the robot triangle on canvas, pointing to its direction"""
         h = self.height * self.s + self.pad
-        w = self.width * self.s + self.pad
         if self.direction == 'NORTH':
-            return self.canvas.create_polygon(int((self.x + .5) * self.s + self.pad), h - (self.y + 1) * self.s,
-                                              self.x * self.s + self.pad, h - self.y * self.s,
-                                              (self.x + 1) * self.s + self.pad, h - self.y * self.s,
-                                              fill="blue")
+            return (int((self.x + .5) * self.s + self.pad), h - (self.y + 1) * self.s,
+                    self.x * self.s + self.pad, h - self.y * self.s,
+                    (self.x + 1) * self.s + self.pad, h - self.y * self.s)
         elif self.direction == 'EAST':
-            return self.canvas.create_polygon((self.x + 1) * self.s + self.pad, h - int((self.y + .5) * self.s),
-                                              self.x * self.s + self.pad, h - self.y * self.s,
-                                              self.x * self.s + self.pad, h - (self.y + 1) * self.s,
-                                              fill="blue")
+            return ((self.x + 1) * self.s + self.pad, h - int((self.y + .5) * self.s),
+                    self.x * self.s + self.pad, h - self.y * self.s,
+                    self.x * self.s + self.pad, h - (self.y + 1) * self.s)
         elif self.direction == 'SOUTH':
-            return self.canvas.create_polygon(self.x * self.s + int(self.s / 2) + self.pad, h - self.y * self.s,
-                                              self.x * self.s + self.pad, h - (self.y + 1) * self.s,
-                                              (self.x + 1) * self.s + self.pad, h - (self.y + 1) * self.s,
-                                              fill="blue")
+            return (self.x * self.s + int(self.s / 2) + self.pad, h - self.y * self.s,
+                    self.x * self.s + self.pad, h - (self.y + 1) * self.s,
+                    (self.x + 1) * self.s + self.pad, h - (self.y + 1) * self.s)
         elif self.direction == 'WEST':
-            return self.canvas.create_polygon(self.x * self.s + self.pad, h - self.y * self.s - int(self.s / 2),
-                                              (self.x + 1) * self.s + self.pad, h - self.y * self.s,
-                                              (self.x + 1) * self.s + self.pad, h - (self.y + 1) * self.s,
-                                              fill="blue")
+            return (self.x * self.s + self.pad, h - self.y * self.s - int(self.s / 2),
+                    (self.x + 1) * self.s + self.pad, h - self.y * self.s,
+                    (self.x + 1) * self.s + self.pad, h - (self.y + 1) * self.s)
 
-    def is_valid_position(self, x, y):
+    def cell_center(self):
+        """center of the robot cell on canvas"""
+        return (self.x + .5) * self.s + self.pad, (self.height - self.y - .5) * self.s + self.pad
+
+    def draw_robot(self):
+        """draw robot on canvas, the polygon is created once and moved afterwards"""
+        if self.robot is None:
+            self.robot = self.canvas.create_polygon(*self.robot_points(), fill="blue")
+        else:
+            self.canvas.coords(self.robot, *self.robot_points())
+        return self.robot
+
+    def is_on_table(self, x, y):
         return 0 <= x < self.width and 0 <= y < self.height
 
-    def is_valid_movement(self):
-        """check if the movement is valid"""
-        if ((((self.direction == 'NORTH' and self.is_valid_position(self.x, self.y + 1))
-              or (self.direction == 'EAST' and self.is_valid_position(self.x + 1, self.y)))
-             or (self.direction == 'SOUTH' and self.is_valid_position(self.x, self.y - 1)))
-                or (self.direction == 'WEST' and self.is_valid_position(self.x - 1, self.y))):
+    def is_valid_position(self, x, y):
+        return self.is_on_table(x, y) and (self.obstacles is None or not self.obstacles.is_blocked(x, y))
+
+    def is_valid_movement(self, count: bool = True):
+        """check if the movement is valid, an ignored MOVE is counted and logged unless count is False"""
+        dx, dy = OFFSETS[self.DIRECTIONS.index(self.direction)]
+        if self.is_valid_position(self.x + dx, self.y + dy):
             return True
-        else:
-            print('[WARNING]ignore "MOVE" command at step {}: {},{},{}'.format(
-                self.step + 1, self.x, self.y, self.direction))
+        elif count:
+            blocked = self.is_on_table(self.x + dx, self.y + dy)
+            metrics.counters['ignored.obstacle' if blocked else 'ignored.edge'] += 1
+            log.warning('ignore "MOVE" command at step %s: %s,%s,%s', self.step + 1, self.x, self.y, self.direction)
 
     def init_canvas(self):
         """initialize canvas"""
@@ -117,38 +267,58 @@ class RobotGUI(Robot):
     def clear_trace(self):
         """clear trace on canvas"""
         if self.canvas:
-            for step in self.trace:
-                self.canvas.delete(step)
-            self.trace = []
+            if self.trace is None:
+                self.trace = Trace(self.canvas)
+            self.trace.clear()
+
+    def draw_obstacles(self):
+        """draw the blocked cells as a single image under the grid lines, sampled down when cells are under a pixel"""
+        if self.obstacle_item is not None:
+            self.canvas.delete(self.obstacle_item)
+            self.obstacle_item = self.obstacle_image = None
+        if self.obstacles is None:
+            return
+        # Cells of the table per pixel of the image
+        k = -(-max(self.width, self.height) // self.cw) if self.s < 1 else 1
+        bits = self.obstacles.bits[::-k]
+        blocked = np.unpackbits(bits, axis=1, count=self.width, bitorder='little')[:, ::k]
+        background = [v >> 8 for v in self.canvas.winfo_rgb(self.canvas['background'])]
+        pixels = np.where(blocked[..., None], np.array(OBSTACLE_COLOR, dtype=np.uint8),
+                          np.array(background, dtype=np.uint8))
+        header = 'P6 {} {} 255\n'.format(pixels.shape[1], pixels.shape[0]).encode()
+        self.obstacle_image = tk.PhotoImage(data=header + pixels.tobytes(), format='PPM')
+        if self.s > 1:
+            self.obstacle_image = self.obstacle_image.zoom(self.s)
+        self.obstacle_item = self.canvas.create_image(self.pad, self.pad, image=self.obstacle_image, anchor=tk.NW,
+                                                      tags=OBSTACLE_TAG)
+        self.canvas.tag_lower(self.obstacle_item)
 
     def refresh_canvas(self):
-        """refresh canvas with grid lines and robot"""
-        if self.canvas:
-            if self.robot:
-                self.canvas.delete(self.robot)
-            for line in self.canvas_lines:
-                self.canvas.delete(line)
-            self.clear_trace()
+        """refresh canvas with grid lines and robot, existing lines are moved instead of recreated"""
+        self.clear_trace()
+        self.draw_obstacles()
         # grid size
         h = self.height * self.s + self.pad
         w = self.width * self.s + self.pad
-        for i in range(0, self.width + 1):
-            self.canvas_lines.append(
-                self.canvas.create_line(i * self.s + self.pad, self.pad, i * self.s + self.pad, h,
-                                        fill='green'))
-        for i in range(0, self.height + 1):
-            self.canvas_lines.append(
-                self.canvas.create_line(self.pad, i * self.s + self.pad, w, i * self.s + self.pad,
-                                        fill='green'))
-        self.robot = self.draw_robot()
+        lines = [(i * self.s + self.pad, self.pad, i * self.s + self.pad, h) for i in range(0, self.width + 1)]
+        lines += [(self.pad, i * self.s + self.pad, w, i * self.s + self.pad) for i in range(0, self.height + 1)]
+        for line in self.canvas_lines[len(lines):]:
+            self.canvas.delete(line)
+        del self.canvas_lines[len(lines):]
+        for line, coords in zip(self.canvas_lines, lines):
+            self.canvas.coords(line, *coords)
+        for coords in lines[len(self.canvas_lines):]:
+            self.canvas_lines.append(self.canvas.create_line(*coords, fill='green'))
+        self.draw_robot()
+        self.canvas.tag_raise(self.robot)
         self.canvas.update()
 
     def place(self, x, y, direction):
         if not self.log_trace:
             self.clear_trace()
         super().place(x, y, direction)
-        self.canvas.delete(self.robot)
-        self.robot = self.draw_robot()
+        self.trace.break_path()
+        self.draw_robot()
 
     def move(self, *args):
         if not self.log_trace:
@@ -156,87 +326,316 @@ class RobotGUI(Robot):
         self.step += 1
         if not self.is_valid_movement():
             return
+        if self.log_trace and self.trace.broken:
+            self.trace.add(*self.cell_center())
         super().move()
         if self.log_trace:
-            self.canvas.itemconfig(self.robot, fill="gray")
-            self.trace.append(self.robot)
-        else:
-            self.clear_trace()
-            self.canvas.delete(self.robot)
-        self.robot = self.draw_robot()
-        self.canvas.after(self.delay)
-        self.canvas.update()
+            self.trace.add(*self.cell_center())
+        self.redraw()
 
     def left(self, *args):
         if not self.log_trace:
             self.clear_trace()
         super().left()
-        self.canvas.delete(self.robot)
-        self.robot = self.draw_robot()
-        self.canvas.after(self.delay)
-        self.canvas.update()
+        self.redraw()
 
     def right(self, *args):
         if not self.log_trace:
             self.clear_trace()
         super().right()
-        self.canvas.delete(self.robot)
-        self.robot = self.draw_robot()
-        self.canvas.after(self.delay)
-        self.canvas.update()
+        self.redraw()
+
+    def redraw(self):
+        """draw the robot at its current position and the new part of the trace"""
+        with metrics.timer('render'):
+            self.trace.flush()
+            self.draw_robot()
 
     def report(self):
         if self.direction is not None:
+            metrics.counters['report'] += 1
             print(self.x, self.y, self.direction)
 
     def process_file_commands(self):
         filepath = askopenfilename()
         if not filepath:
             return
-        with open(filepath, 'r') as f:
-            commands = f.read().splitlines()
-            self.process_commands(commands)
+        if filepath.endswith('.trace'):
+            self.replay_trace(filepath)
+        elif filepath.endswith('.map'):
+            self.load_map(filepath)
+        else:
+            self.replay_file(filepath)
+
+    def replay_trace(self, path):
+        """replay a trace file recorded by robot.py, on a table of its size"""
+        trace = TraceReader(path)
+        for entry, size in ((self.width_entry, trace.length), (self.height_entry, trace.width)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(size))
+        self.resize()
+        self.start_replay(trace.actions, len(trace))
+
+    def load_map(self, path):
+        """load an obstacle map saved by obstacles.py, on a table of its size"""
+        obstacles = ObstacleMap.load(path)
+        for entry, size in ((self.width_entry, obstacles.length), (self.height_entry, obstacles.width)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(size))
+        self.obstacles = obstacles
+        self.resize()
+
+    def replay_file(self, path):
+        """replay the commands of a file, read again from the file when seeking backwards"""
+        self.start_replay(lambda: self.actions(compile_stream(read_commands(path))), None)
 
     def process_commands(self, commands):
+        """replay a list of commands, a compiled program or a stream of commands without blocking the window"""
+        if isinstance(commands, Program):
+            programs, total = [commands], None
+        elif isinstance(commands, list):
+            with metrics.timer('parse'):
+                programs, total = [compile_cached(tuple(commands))], len(commands)
+        else:
+            # A stream can only be read once, it is kept as compiled programs to seek in it
+            with metrics.timer('parse'):
+                programs, total = list(compile_stream(commands)), None
+        self.start_replay(lambda: self.actions(programs), total)
+
+    def start_replay(self, source, total):
+        """replay the actions of source(), which gives them from the start on every call"""
+        if self.playback:
+            self.playback.pause()
         self.log_trace = True
         self.clear_trace()
+        self.playback = Playback(self.root, self, source, speed=self.speed, total=total,
+                                 on_frame=self.update_controls, on_end=self.end_replay)
+        self.position_scale.configure(to=len(self.playback))
+        self.playback.play()
+
+    def actions(self, programs):
+        """steps of the programs one by one, a MOVE run gives one step per MOVE, commands before a PLACE are dropped"""
         placed = False
-        for i, command in enumerate(commands):
-            self.step = i
-            if not placed and not command.startswith('PLACE '):
-                print('[WARNING]ignore "{}" command at step {}: please provide available PLACE command at first.'
-                      .format(command, i + 1))
-                continue
-            if command.startswith('PLACE '):
-                x, y, direction = command[6:].split(',')
-                x, y = int(x), int(y)
-                if self.is_valid_position(x, y) and direction in self.DIRECTIONS:
-                    placed = True
-                    self.place(int(x), int(y), direction)
-            elif command == 'MOVE':
-                self.move()
-            elif command == 'LEFT':
-                self.left()
-            elif command == 'RIGHT':
-                self.right()
-            elif command == 'REPORT':
-                self.report()
+        programs = iter(programs)
+        while True:
+            # Programs of a stream are compiled as they are read
+            with metrics.timer('parse'):
+                program = next(programs, None)
+            if program is None:
+                return
+            for op, step, a, b, c in program:
+                if op == INVALID:
+                    # Raise the error of parsing the command
+                    parse_place(program.texts[a])
+                if not placed and op != PLACE:
+                    # Commands read again after seeking backwards are not counted twice
+                    if self.playback.replaying:
+                        continue
+                    metrics.counters['ignored.unplaced'] += a if op == MOVE else 1
+                    if log.isEnabledFor(logging.WARNING):
+                        command = program.command(op, a, b, c)
+                        for i in range(a if op == MOVE else 1):
+                            log.warning('ignore "%s" command at step %s: please provide available PLACE command at '
+                                        'first.', command, step + i + 1)
+                    continue
+                if op == PLACE:
+                    if self.is_valid_position(a, b) and c >= 0:
+                        placed = True
+                        yield op, step, a, b, c
+                    elif not self.playback.replaying:
+                        metrics.counters['ignored.place'] += 1
+                elif op == MOVE:
+                    for i in range(a):
+                        yield op, step + i, 1, 0, 0
+                else:
+                    yield op, step, a, b, c
+
+    def apply(self, action):
+        """apply a step of a replay, counted like robot.Robot does, the robot is drawn once per frame by redraw"""
+        op, step, a, b, c = action
+        self.step = step
+        # Steps applied again after seeking backwards are not counted twice
+        count = not self.playback.replaying
+        if op == PLACE:
+            Robot.place(self, a, b, self.DIRECTIONS[c])
+            self.trace.break_path()
+        elif op == MOVE:
+            if not self.is_valid_movement(count):
+                return
+            if self.trace.broken:
+                self.trace.add(*self.cell_center())
+            Robot.move(self)
+            self.trace.add(*self.cell_center())
+        elif op == LEFT:
+            Robot.left(self)
+        elif op == RIGHT:
+            Robot.right(self)
+        elif op == REPORT:
+            self.report()
+        elif op == OTHER:
+            if count:
+                metrics.counters['ignored.unknown'] += 1
+            return
+        if count:
+            metrics.counters['executed'] += 1
+
+    def snapshot(self):
+        """state of the replay: position, direction, step and trace"""
+        return self.x, self.y, self.direction, self.step, self.trace.state()
+
+    def restore(self, state):
+        self.x, self.y, self.direction, self.step, trace = state
+        self.trace.restore(trace)
+
+    def update_controls(self, playback):
+        self.position_scale.configure(to=len(playback))
+        self.position_scale.set(playback.position)
+        self.play_button.configure(text="Play" if playback.paused else "Pause")
+
+    def end_replay(self, playback):
         self.log_trace = False
+        self.play_button.configure(text="Play")
+
+    def toggle_replay(self):
+        if self.playback:
+            self.log_trace = True
+            self.playback.toggle()
+            self.update_controls(self.playback)
+
+    def step_replay(self):
+        if self.playback:
+            self.log_trace = True
+            self.playback.step()
+
+    def end_of_replay(self):
+        if self.playback:
+            self.log_trace = True
+            self.playback.end()
+
+    def seek_replay(self, event=None):
+        if self.playback:
+            self.log_trace = True
+            self.playback.seek(self.position_scale.get())
+
+    def set_speed(self, value):
+        self.speed = int(value)
+        if self.playback:
+            self.playback.speed = self.speed
 
     def explore(self):
-        data = [[0] * self.width for _ in range(self.height)]
-        data[self.y][self.x] = 1
-        router = Router()
-        commands = router.solve(data)
-        self.process_commands(commands)
+        """explore the table in a worker process, the commands are replayed when they arrive"""
+        if self.exploration is not None:
+            return
+        if self.obstacles is None:
+            data = [[0] * self.width for _ in range(self.height)]
+            data[self.y][self.x] = 1
+        else:
+            data = self.obstacles.grid(starts=[(self.x, self.y)])
+        key = None
+        if self.router.cache is not None:
+            # Repeated explorations are replayed from the cache without starting a worker
+            key = self.router.cache_key(data)
+            commands = self.router.cache.get(key)
+            if commands is not None:
+                self.router.metrics.counters['cache.hit'] += 1
+                self.status.configure(text='explored from the cache')
+                self.process_commands(commands)
+                return
+        messages = multiprocessing.Queue()
+        # Solve with a fresh router, the on-disk cache is shared with the worker
+        router = Router(backend=self.router.backend, config=self.router.config, cost_model=self.router.cost_model,
+                        cache=RouteCache(directory=self.router.cache.directory) if self.router.cache else None)
+        # Not a daemon, tiles and fleets are solved by a pool of processes started by the worker
+        process = multiprocessing.Process(target=explore_table, args=(data, router, messages))
+        process.start()
+        self.exploration = {'process': process, 'messages': messages, 'started': time.perf_counter(), 'best': None,
+                            'key': key}
+        self.explore_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.poll_exploration()
+
+    def poll_exploration(self):
+        """show the progress of the exploration and replay its commands once they arrive"""
+        exploration = self.exploration
+        if exploration is None:
+            return
+        result = None
+        while result is None:
+            try:
+                kind, value = exploration['messages'].get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                exploration['best'] = value
+            else:
+                result = kind, value
+        elapsed = time.perf_counter() - exploration['started']
+        if result is None and not exploration['process'].is_alive() and exploration['messages'].empty():
+            result = 'error', 'worker process exited with code {}'.format(exploration['process'].exitcode)
+        if result is None:
+            best = '' if exploration['best'] is None else ', best route {}'.format(exploration['best'])
+            self.status.configure(text='exploring {:.1f}s{}'.format(elapsed, best))
+            self.root.after(100, self.poll_exploration)
+            return
+        exploration['process'].join()
+        kind, value = result
+        if kind == 'error':
+            log.error('exploration failed: %s', value)
+            self.end_exploration('exploration failed')
+            return
+        if exploration['key'] is not None:
+            # The worker stored the commands on disk, keep them in memory too
+            self.router.cache.remember(exploration['key'], value)
+        self.end_exploration('explored in {:.1f}s'.format(elapsed))
+        self.process_commands(value)
+
+    def cancel_exploration(self):
+        if self.exploration is not None:
+            self.exploration['process'].terminate()
+            self.exploration['process'].join()
+            self.end_exploration('exploration cancelled')
+
+    def close(self):
+        """cancel the exploration before closing the window, the exit would wait for its worker otherwise"""
+        self.cancel_exploration()
+        self.root.destroy()
+
+    def end_exploration(self, text):
+        self.exploration = None
+        self.status.configure(text=text)
+        self.explore_button.configure(state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.DISABLED)
 
     def resize(self):
         self.width = int(self.width_entry.get())
         self.height = int(self.height_entry.get())
+        if self.obstacles is not None and self.obstacles.shape != (self.height, self.width):
+            # The map is of another table
+            self.obstacles.close()
+            self.obstacles = None
         self.s = int(self.cw / max(self.width, self.height))
         self.refresh_canvas()
 
     def create_buttons(self):
+        # replay controls
+        controls = tk.Frame(self.root)
+        self.play_button = tk.Button(controls, text="Play", width=6, command=self.toggle_replay)
+        step_button = tk.Button(controls, text="Step", command=self.step_replay)
+        end_button = tk.Button(controls, text="End", command=self.end_of_replay)
+        speed_scale = tk.Scale(controls, from_=1, to=1000, orient=tk.HORIZONTAL, label="steps/s",
+                               command=self.set_speed)
+        speed_scale.set(self.speed)
+        self.position_scale = tk.Scale(controls, from_=0, to=0, orient=tk.HORIZONTAL, length=300, label="step")
+        self.position_scale.bind('<ButtonRelease-1>', self.seek_replay)
+        self.status = tk.Label(controls, anchor=tk.W)
+        controls.pack(side=tk.BOTTOM, fill=tk.X)
+        self.play_button.pack(side=tk.LEFT)
+        step_button.pack(side=tk.LEFT)
+        end_button.pack(side=tk.LEFT)
+        speed_scale.pack(side=tk.LEFT)
+        self.position_scale.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.status.pack(side=tk.LEFT, fill=tk.X)
+
         self.width_entry = tk.Entry(self.root, width=10)
         self.width_entry.insert(0, '5')
         self.height_entry = tk.Entry(self.root, width=10)
@@ -250,11 +649,13 @@ class RobotGUI(Robot):
         self.place_entry = tk.Entry(self.root, width=10)
         self.place_entry.insert(0, '0,0,EAST')
         button = tk.Button(self.root, text="Open File", command=self.process_file_commands)
-        explore = tk.Button(self.root, text="Explore", command=self.explore)
+        self.explore_button = tk.Button(self.root, text="Explore", command=self.explore)
+        self.cancel_button = tk.Button(self.root, text="Cancel", state=tk.DISABLED, command=self.cancel_exploration)
         self.width_entry.pack(side=tk.LEFT)
         self.height_entry.pack(side=tk.LEFT)
         size_button.pack(side=tk.LEFT)
-        explore.pack(side=tk.RIGHT)
+        self.cancel_button.pack(side=tk.RIGHT)
+        self.explore_button.pack(side=tk.RIGHT)
         button.pack(side=tk.RIGHT)
         place_button.pack(side=tk.RIGHT)
         self.place_entry.pack(side=tk.RIGHT)
@@ -266,22 +667,38 @@ class RobotGUI(Robot):
         place_str = self.place_entry.get()
         sp = place_str.split(',')
         if len(sp) < 3:
-            print('[WARNING]ignore "PLACE" command: {}, correct format: x,y,direction'.format(place_str))
+            log.warning('ignore "PLACE" command: %s, correct format: x,y,direction', place_str)
             return
         x, y, direction = sp
         x, y = int(x), int(y)
         if self.is_valid_position(x, y) and direction in self.DIRECTIONS:
             self.place(int(x), int(y), direction)
         else:
-            print('[WARNING]ignore "PLACE" command: {}, correct format: x,y,direction'.format(place_str))
+            log.warning('ignore "PLACE" command: %s, correct format: x,y,direction', place_str)
 
     def start(self):
         self.root.mainloop()
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Toy Robot Simulator UI')
+    parser.add_argument('--timing', action='store_true', help='print the startup time of the window')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='print the ignored commands, twice to also print every step')
+    parser.add_argument('--metrics', action='store_true', help='print the event counters and timings on exit')
+    args = parser.parse_args()
+    if args.verbose:
+        events.enable(logging.DEBUG if args.verbose > 1 else logging.WARNING)
+    started = time.perf_counter()
     robot = RobotGUI()
+    if args.timing:
+        # CPU time of the process also covers the interpreter start and the imports
+        robot.root.after_idle(lambda: print(
+            '[INFO]startup: window ready in {:.3f}s, {:.3f}s of CPU time with the imports, OR-Tools loaded: {}'
+            .format(time.perf_counter() - started, time.process_time(), 'ortools' in sys.modules)))
     robot.start()
+    if args.metrics:
+        print(metrics.summary(), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -1,71 +1,391 @@
-import math
-from ortools.constraint_solver import routing_enums_pb2, pywrapcp
+import logging
+import sys
+import time
+from itertools import chain
+
+import numpy as np
+
+import events
+import planners
+from bytecode import Program
+from cache import RouteCache
+from cost import CostModel
+from events import log
+from fleet import FleetPlanner
+from grid import GridGraph
+from translation import translate_route
+
+
+class SolverConfig:
+    """
+    Search settings of the OR-Tools backend.
+
+    time_limit is the search budget in seconds. first_solution_strategy and local_search_metaheuristic are
+    names from routing_enums_pb2, e.g. 'PATH_CHEAPEST_ARC' and 'GUIDED_LOCAL_SEARCH'. The search also stops
+    after solution_limit solutions, after no_improvement_limit solutions in a row without a better objective,
+    or no_improvement_time seconds after the last better objective. The solver reports few of the solutions a
+    metaheuristic visits, no_improvement_time is the one stopping a stalled search reliably.
+    callback(objective, elapsed, routes) is called with every improved solution.
+    """
+
+    def __init__(self, time_limit: float = 15, first_solution_strategy: str = 'PATH_CHEAPEST_ARC',
+                 local_search_metaheuristic: str = 'AUTOMATIC', solution_limit: int = None,
+                 no_improvement_limit: int = None, callback=None, no_improvement_time: float = None):
+        self.time_limit = time_limit
+        self.first_solution_strategy = first_solution_strategy
+        self.local_search_metaheuristic = local_search_metaheuristic
+        self.solution_limit = solution_limit
+        self.no_improvement_limit = no_improvement_limit
+        self.no_improvement_time = no_improvement_time
+        self.callback = callback
+
+    def search_parameters(self):
+        """OR-Tools search parameters of the configuration."""
+        from ortools.constraint_solver import routing_enums_pb2, pywrapcp
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.first_solution_strategy = self.enum_value(
+            routing_enums_pb2.FirstSolutionStrategy, self.first_solution_strategy, 'first solution strategy')
+        search_parameters.local_search_metaheuristic = self.enum_value(
+            routing_enums_pb2.LocalSearchMetaheuristic, self.local_search_metaheuristic, 'local search metaheuristic')
+        search_parameters.time_limit.FromMilliseconds(int(self.time_limit * 1000))
+        if self.solution_limit:
+            search_parameters.solution_limit = self.solution_limit
+        return search_parameters
+
+    @staticmethod
+    def enum_value(enum, name: str, kind: str) -> int:
+        values = enum.DESCRIPTOR.enum_types_by_name['Value'].values_by_name
+        if name not in values:
+            raise ValueError('unknown {} "{}", available: {}'.format(kind, name, list(values)))
+        return values[name].number
 
 
 class Router:
-    def __init__(self):
+    # Planning backends are the planners registered in planners.py. 'auto' sweeps tables without blocked cells,
+    # splits large tables into tiles and uses the solver otherwise, or the greedy planner without OR-Tools.
+    # 'heading' runs the solver over (cell, heading) states to save rotations
+    # Number of cells above which 'auto' splits the table into tiles
+    TILED_THRESHOLD = 4096
+    # Weight of the longest route in the objective of the solver when several robots share the table
+    SPAN_COST = 100
+
+    def __init__(self, backend: str = 'auto', cache: RouteCache = None, config: SolverConfig = None,
+                 cost_model: CostModel = None, metrics: events.Metrics = None):
+        if backend != 'auto' and backend not in planners.PLANNERS:
+            raise ValueError('unknown backend "{}", available backends: {}'.format(backend,
+                                                                                 ['auto'] + planners.names()))
+        self.backend = backend
+        self.cache = cache
+        self.config = config or SolverConfig()
+        self.cost_model = cost_model or CostModel()
+        self.metrics = metrics or events.metrics
+        # Command counts and estimated execution time of the last solved route
+        self.stats = None
         self.manager = None
         self.distance_matrix = None
         self.routes = None
         self.start = None
 
+    def cache_key(self, grid) -> str:
+        """Key of the commands of a grid in the cache, they depend on the backend and the cost model."""
+        return self.cache.key(grid, self.backend, self.cost_model.move_time, self.cost_model.turn_time)
+
     def solve(self, grid) -> [str]:
+        """Solve the routing problem, the commands are served from the cache when there is one."""
+        if self.cache is None:
+            with self.metrics.timer('solve'):
+                commands = self.solve_grid(grid)
+        else:
+            key = self.cache_key(grid)
+            commands = self.cache.get(key)
+            if commands is None:
+                with self.metrics.timer('solve'):
+                    commands = self.solve_grid(grid)
+                self.cache.put(key, commands)
+            else:
+                self.metrics.counters['cache.hit'] += 1
+                self.routes = None
+        self.stats = self.cost_model.evaluate(commands)
+        return commands
+
+    def solve_fleet(self, grid) -> [[str]]:
+        """
+        Split the exploration between robots starting from every marked cell, returns the commands of each robot.
+
+        Robots are ordered row by row like the marked cells. The routes minimize the longest route rather than
+        their total length, after solving router.stats holds the command counts of each robot.
+        """
+        if self.cache is None:
+            with self.metrics.timer('solve'):
+                robots = self.solve_fleet_grid(grid)
+        else:
+            marked = tuple(np.flatnonzero(np.asarray(grid) > 0).tolist())
+            key = self.cache.key(grid, 'fleet', marked, self.backend, self.cost_model.move_time,
+                                 self.cost_model.turn_time)
+            commands = self.cache.get(key)
+            if commands is None:
+                with self.metrics.timer('solve'):
+                    robots = self.solve_fleet_grid(grid)
+                self.cache.put(key, [command for commands in robots for command in commands])
+            else:
+                # Every robot has a single PLACE command, at the start of its commands
+                self.metrics.counters['cache.hit'] += 1
+                robots = []
+                for command in commands:
+                    if command.startswith('PLACE '):
+                        robots.append([])
+                    robots[-1].append(command)
+                self.routes = None
+        self.stats = [self.cost_model.evaluate(commands) for commands in robots]
+        return robots
+
+    def solve_grid(self, grid) -> [str]:
         """Solve the routing problem."""
+        data, routes = self.plan(grid)
+        return self.wrap_result(data, routes)
+
+    def solve_fleet_grid(self, grid) -> [[str]]:
+        """Solve the routing problem of several robots."""
+        data, routes = self.plan(grid, fleet=True)
+        return [self.wrap_result(data, [route]) for route in routes]
+
+    def plan(self, grid, fleet: bool = False):
+        """Create the data and plan the routes with the backend, returns both."""
         # Create the data
-        data = self.create_data_model(grid)
-        # Create the routing index manager
-        self.manager = pywrapcp.RoutingIndexManager(len(data['locations']), data['num_vehicles'], data['depot'])
+        data = self.create_data_model(grid, fleet)
+        backend = self.backend
+        if data['num_vehicles'] > 1 and backend not in planners.MULTI_VEHICLE:
+            # Every robot covers its own region of the table
+            self.routes = FleetPlanner(backend='auto' if backend == 'coverage' else backend,
+                                       config=self.config).solve(data)
+            return data, self.routes
+        if backend == 'auto':
+            if data['graph'].free.all():
+                backend = 'coverage'
+            elif len(data['graph']) > self.TILED_THRESHOLD:
+                backend = 'tiled'
+            else:
+                backend = 'ortools' if planners.available('ortools') else 'greedy'
+        self.routes = planners.create(backend, self).solve(data)
+        return data, self.routes
+
+    def solve_tsp(self, data, heading: bool = False, initial_routes=None):
+        """
+        Solve the routing problem with OR-Tools, returns the routes as node ids.
+
+        With heading, the solver visits one of the 4 states (cell, heading) of every cell and the arc costs
+        include the rotations given by the cost model. The robot starts facing EAST like in wrap_result.
+        Nodes listed in data['optional'] may be skipped for free. When initial_routes are given, one list of
+        nodes per vehicle without its start, the search starts from them instead of a first solution.
+        """
+        from ortools.constraint_solver import pywrapcp
+        graph = data['graph']
+        states = 4 if heading else 1
+        vehicles = data['num_vehicles']
+        optional = set(data.get('optional', ()))
+        # Create the routing index manager, routes end at an extra free node so the robots do not return
+        end = states * len(graph)
+        starts = [states * depot + (1 if heading else 0) for depot in data['starts']]
+        self.manager = pywrapcp.RoutingIndexManager(end + 1, vehicles, starts, [end] * vehicles)
         # Create Routing Model
         routing = pywrapcp.RoutingModel(self.manager)
         # Calculate the distance between two points
-        self.distance_matrix = self.compute_euclidean_distance_matrix(data['locations'])
-        # Register the distance callback
-        transit_callback_index = routing.RegisterTransitCallback(self.distance_callback)
+        self.distance_matrix = graph
+        # Register the arc costs
+        if heading:
+            transit_callback_index = self.cost_model.register(routing, self.manager, graph)
+            # Every cell is entered with exactly one heading, the other states of the start cells are skipped
+            penalty = 10 * graph.PENALTY * self.cost_model.SCALE
+            for cell in range(len(graph)):
+                nodes = [self.manager.NodeToIndex(4 * cell + h) for h in range(4) if 4 * cell + h not in starts]
+                if nodes:
+                    routing.AddDisjunction(nodes, 0 if cell in data['starts'] or cell in optional else penalty, 1)
+        else:
+            transit_callback_index = graph.register(routing, self.manager)
+            for node in optional:
+                routing.AddDisjunction([self.manager.NodeToIndex(node)], 0)
         # Define cost of each arc
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        if vehicles > 1:
+            # Minimize the longest route, the time the robots need to explore the table together
+            routing.AddDimension(transit_callback_index, 0, np.iinfo(np.int64).max // 4, True, 'Distance')
+            routing.GetDimensionOrDie('Distance').SetGlobalSpanCostCoefficient(self.SPAN_COST)
 
         # Define strategy
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
-        search_parameters.time_limit.seconds = 15
+        search_parameters = self.config.search_parameters()
+        if self.config.callback or self.config.no_improvement_limit or self.config.no_improvement_time:
+            monitor, stalled = self.solution_monitor(data, routing, states)
+            routing.AddAtSolutionCallback(monitor)
+            if self.config.no_improvement_limit or self.config.no_improvement_time:
+                # Checked by the solver all along the search, not only when it reports a solution
+                limit = routing.solver().CustomLimit(stalled)
+                routing.AddSearchMonitor(limit)
 
-        # Solve the problem
-        solution = routing.SolveWithParameters(search_parameters)
+        # Solve the problem, from the initial routes when they are a valid solution
+        solution = None
+        if initial_routes is not None:
+            if heading:
+                initial_routes = [self.heading_states(graph, [depot] + route)[1:]
+                                  for depot, route in zip(data['starts'], initial_routes)]
+            assignment = routing.ReadAssignmentFromRoutes(initial_routes, True)
+            if assignment is not None:
+                solution = routing.SolveFromAssignmentWithParameters(assignment, search_parameters)
+        if solution is None:
+            solution = routing.SolveWithParameters(search_parameters)
+        if solution is None:
+            raise RuntimeError('no route found within the time limit of {}s'.format(self.config.time_limit))
         routes = self.get_routes(solution, routing, self.manager)
-        return self.wrap_result(data, routes)
+        return [[node // states for node in route if node != end] for route in routes]
+
+    @staticmethod
+    def heading_states(graph, route):
+        """States (4 * cell + heading) of a route of cells, each cell entered with the heading of its walk."""
+        states = [4 * route[0] + 1]
+        for node in route[1:]:
+            walk = graph.path(states[-1] // 4, node)
+            heading = int(np.flatnonzero(graph.neighbors[walk[-2]] == node)[0]) if len(walk) > 1 else states[-1] % 4
+            states.append(4 * node + heading)
+        return states
+
+    def solution_monitor(self, data, routing, states):
+        """
+        Callback run by the solver at every solution, streaming the improvements, and the limit function of a
+        stalled search, true once the search is to stop.
+        """
+        started = time.perf_counter()
+        config = self.config
+        state = {'best': None, 'stalled': 0, 'deadline': float('inf')}
+
+        def monitor():
+            objective = routing.CostVar().Value()
+            if state['best'] is not None and objective >= state['best']:
+                state['stalled'] += 1
+                if config.no_improvement_limit and state['stalled'] >= config.no_improvement_limit:
+                    state['deadline'] = 0
+                return
+            state['best'], state['stalled'] = objective, 0
+            if config.no_improvement_time:
+                state['deadline'] = time.perf_counter() + config.no_improvement_time
+            if self.config.callback:
+                routes = []
+                for vehicle in range(routing.vehicles()):
+                    index = routing.Start(vehicle)
+                    route = []
+                    while not routing.IsEnd(index):
+                        route.append(self.manager.IndexToNode(index) // states)
+                        index = routing.NextVar(index).Value()
+                    routes.append(data['graph'].expand(route))
+                self.config.callback(objective, time.perf_counter() - started, routes)
+
+        def stalled():
+            return time.perf_counter() > state['deadline']
+
+        return monitor, stalled
+
+    def replan(self, grid, route, position, visited=(), blocked=()) -> [str]:
+        """
+        Re-plan the rest of an exploration once the robot covered part of the table or the table changed.
+
+        route is the previous route as (x, y) cells, e.g. cells_of(commands), position is the (x, y) cell of the
+        robot, visited the cells already covered and blocked the cells which became obstacles. Covered cells are
+        only walked through when needed. The solver starts from the previous order of the remaining cells, tables
+        too large for it keep that order and only repair the walk. Without OR-Tools, or with a backend which is
+        not a solver, the remaining cells are planned by the greedy planner. Returns the commands from the
+        position of the robot.
+        """
+        cells = np.array(grid, copy=True)
+        cells[cells > 0] = 0
+        for x, y in blocked:
+            cells[y, x] = -1
+        cells[position[1], position[0]] = 1
+        data = self.create_data_model(cells)
+        graph = data['graph']
+        depot = data['depot']
+        done = {int(graph.node_of[y, x]) for x, y in visited if graph.node_of[y, x] >= 0} | {depot}
+        # Remaining cells in the order of the previous route, cells it did not visit come last
+        order = []
+        seen = set(done)
+        for x, y in chain(route, zip(graph.xs.tolist(), graph.ys.tolist())):
+            node = int(graph.node_of[y, x]) if 0 <= x < graph.width and 0 <= y < graph.height else -1
+            if node >= 0 and node not in seen:
+                seen.add(node)
+                order.append(node)
+        data['optional'] = sorted(done - {depot})
+        backend = self.backend
+        solver = backend in ('ortools', 'heading') or (backend == 'auto' and len(graph) <= self.TILED_THRESHOLD
+                                                        and planners.available('ortools'))
+        if solver:
+            routes = self.solve_tsp(data, heading=backend == 'heading', initial_routes=[order])
+            self.routes = [graph.expand(route) for route in routes]
+        elif backend == 'auto' and planners.available('ortools'):
+            self.routes = [graph.expand([depot] + order)]
+        else:
+            self.routes = planners.create('greedy', self).solve(data)
+        commands = self.wrap_result(data, self.routes)
+        self.stats = self.cost_model.evaluate(commands)
+        return commands
+
+    @staticmethod
+    def cells_of(commands) -> [(int, int)]:
+        """Cells visited by a list of commands, in order, as (x, y)."""
+        DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+        cells = []
+        x = y = heading = None
+        for command in commands:
+            if command.startswith('PLACE '):
+                px, py, direction = command[6:].split(',')
+                x, y, heading = int(px), int(py), DIRECTIONS.index(direction)
+            elif heading is None:
+                continue
+            elif command == 'MOVE':
+                dx, dy = GridGraph.OFFSETS[heading]
+                x, y = x + dx, y + dy
+            elif command == 'LEFT':
+                heading = (heading - 1) % 4
+            elif command == 'RIGHT':
+                heading = (heading + 1) % 4
+            else:
+                continue
+            if not cells or cells[-1] != (x, y):
+                cells.append((x, y))
+        return cells
 
     def distance_callback(self, from_index, to_index):
         """Returns the distance between the two nodes."""
         from_node = self.manager.IndexToNode(from_index)
         to_node = self.manager.IndexToNode(to_index)
-        return self.distance_matrix[from_node][to_node]
+        if from_node >= len(self.distance_matrix) or to_node >= len(self.distance_matrix):
+            return 0
+        return self.distance_matrix.distance(from_node, to_node)
 
     @staticmethod
-    def create_data_model(grid):
-        def search_start():
-            """Search the start point."""
-            for i in range(len(grid)):
-                for j in range(len(grid[i])):
-                    if grid[i][j] > 0:
-                        return i, j
-            return 0, 0
-
-        start = search_start()
+    def create_data_model(grid, fleet: bool = False):
+        # Rows of cells, an array or an ObstacleMap, whose blocked cells become -1
+        cells = np.asarray(grid)
+        graph = GridGraph(cells)
+        # The start point is the first marked cell, the first free cell if there is none. A fleet has a robot on
+        # every marked cell
+        marked = np.flatnonzero(cells > 0)
+        starts = [divmod(int(cell), graph.width) for cell in (marked if fleet else marked[:1])]
+        if not starts:
+            starts = [(int(graph.ys[0]), int(graph.xs[0])) if len(graph) else (0, 0)]
+        if len(graph) and not graph.free.all():
+            # Cells walled off from the start points can not be explored
+            labels = graph.components()
+            reachable = np.isin(labels, [labels[graph.node_of[start]] for start in starts])
+            if not reachable.all():
+                cells = cells.copy()
+                cells[graph.ys[~reachable], graph.xs[~reachable]] = -1
+                graph = GridGraph(cells)
+        starts = [max(int(graph.node_of[start]), 0) for start in starts]
         # Create the data
         data = {
-            'locations': [],
-            'depot': 0,
-            'num_vehicles': 1,
+            'locations': list(zip(graph.xs.tolist(), graph.ys.tolist())),
+            'depot': starts[0],
+            'starts': starts,
+            'num_vehicles': len(starts),
+            'graph': graph,
         }
-        count = 0
-        for i in range(len(grid)):
-            for j in range(len(grid[i])):
-                if grid[i][j] >= 0:
-                    data['locations'].append((j, i))
-                    if i == start[0] and j == start[1]:
-                        data['depot'] = count
-                    count += 1
         return data
 
     def get_routes(self, solution, routing, manager):
@@ -81,122 +401,40 @@ class Router:
 
     @staticmethod
     def wrap_result(data, routes):
-        """Wrap the result into a list of commands."""
-        DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
-        x = [data['locations'][i][0] for i in routes[0]]
-        y = [data['locations'][i][1] for i in routes[0]]
-        commands = ['PLACE {},{},EAST'.format(x[0], y[0])]
-        xp, yp = x[0], y[0]
-        direction = 'EAST'
-        for i in range(1, len(x)):
-            if direction == 'NORTH':
-                # Turn right and move to the next point
-                if x[i] - xp == 1 and y[i] - yp == 0:
-                    commands.append('RIGHT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[(DIRECTIONS.index(direction) + 1) % 4]
-                # Turn left and move to the next point
-                elif x[i] - xp == -1 and y[i] - yp == 0:
-                    commands.append('LEFT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 1]
-                # Move to the next point
-                elif y[i] - yp == 1 and x[i] - xp == 0:
-                    commands.append('MOVE')
-                # Turn around and move to the next point
-                elif y[i] - yp == -1 and x[i] - xp == 0:
-                    commands.append('LEFT')
-                    commands.append('LEFT')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 2]
-                else:
-                    print('[ERROR] Invalid movement:{} ({}, {}) -> ({}, {})'.format(direction, xp, yp, x[i], y[i]))
-            elif direction == 'EAST':
-                # Move to the next point
-                if x[i] - xp == 1:
-                    commands.append('MOVE')
-                # Turn left and move to the next point
-                elif y[i] - yp == 1:
-                    commands.append('LEFT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 1]
-                # Turn right and move to the next point
-                elif y[i] - yp == -1:
-                    commands.append('RIGHT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[(DIRECTIONS.index(direction) + 1) % 4]
-                # Turn around and move to the next point
-                elif x[i] - xp == -1:
-                    commands.append('LEFT')
-                    commands.append('LEFT')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 2]
-                else:
-                    print('[ERROR] Invalid movement:{} ({}, {}) -> ({}, {})'.format(direction, xp, yp, x[i], y[i]))
-            elif direction == 'SOUTH':
-                # Turn left and move to the next point
-                if x[i] - xp == 1:
-                    commands.append('LEFT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 1]
-                # Turn right and move to the next point
-                elif x[i] - xp == -1:
-                    commands.append('RIGHT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[(DIRECTIONS.index(direction) + 1) % 4]
-                # Move to the next point
-                elif y[i] - yp == -1:
-                    commands.append('MOVE')
-                # Turn around and move to the next point
-                elif y[i] - yp == 1:
-                    commands.append('LEFT')
-                    commands.append('LEFT')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 2]
-                else:
-                    print('[ERROR] Invalid movement:{} ({}, {}) -> ({}, {})'.format(direction, xp, yp, x[i], y[i]))
-            else:
-                # Move to the next point
-                if x[i] - xp == -1:
-                    commands.append('MOVE')
-                # Turn right and move to the next point
-                elif y[i] - yp == 1:
-                    commands.append('RIGHT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[(DIRECTIONS.index(direction) + 1) % 4]
-                # Turn left and move to the next point
-                elif y[i] - yp == -1:
-                    commands.append('LEFT')
-                    commands.append('MOVE')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 1]
-                # Turn around and move to the next point
-                elif x[i] - xp == 1:
-                    commands.append('LEFT')
-                    commands.append('LEFT')
-                    direction = DIRECTIONS[DIRECTIONS.index(direction) - 2]
-                else:
-                    print('[ERROR] Invalid movement:{} ({}, {}) -> ({}, {})'.format(direction, xp, yp, x[i], y[i]))
-            xp, yp = x[i], y[i]
-        return commands
+        """Wrap the result into a list of commands, hops between cells which are not adjacent are logged at once."""
+        translation = translate_route(data, routes[0])
+        if len(translation.invalid):
+            log.error('Invalid movements: %s', translation.report())
+        return translation.commands()
+
+    @staticmethod
+    def wrap_program(data, routes) -> Program:
+        """Wrap the result into a compiled program, for routes too long to be kept as a list of commands."""
+        translation = translate_route(data, routes[0])
+        if len(translation.invalid):
+            log.error('Invalid movements: %s', translation.report())
+        return translation.program()
 
     @staticmethod
     def compute_euclidean_distance_matrix(locations):
-        """Creates callback to return distance between points."""
-        distances = {}
-        length = int(math.sqrt(len(locations)))
-        for from_counter, from_node in enumerate(locations):
-            distances[from_counter] = {}
-            for to_counter, to_node in enumerate(locations):
-                if from_counter == to_counter:
-                    distances[from_counter][to_counter] = 0
-                elif abs(from_counter - to_counter) == length or \
-                        (from_counter - to_counter == 1 and from_counter % length != 0) or \
-                        (from_counter - to_counter == -1 and to_counter % length != 0):
-                    distances[from_counter][to_counter] = 1
-                else:
-                    # Euclidean distance
-                    distances[from_counter][to_counter] = 10000
-        return distances
+        """Creates the grid graph giving the distance between points."""
+        return GridGraph.from_locations(locations)
 
 
-if __name__ == '__main__':
+def main():
+    # Explore a LENGTH,WIDTH[,X,Y] table and print the commands, so they can be piped into robot.py
+    events.enable(logging.ERROR, sys.stderr)
+    if len(sys.argv) > 1:
+        size = [int(v) for v in sys.argv[1].split(',')]
+        length, width = size[:2]
+        x, y = size[2:4] if len(size) >= 4 else (0, 0)
+        grid = [[0] * length for _ in range(width)]
+        grid[y][x] = 1
+        router = Router()
+        sys.stdout.writelines(command + '\n' for command in router.solve(grid))
+        print('{commands} commands: {moves} MOVE, {turns} LEFT/RIGHT, estimated time {time:.1f}s'
+              .format(**router.stats), file=sys.stderr)
+        return
     router = Router()
     movements = router.solve([
         [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -210,6 +448,11 @@ if __name__ == '__main__':
         [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
         [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
     ])
+    print('{commands} commands: {moves} MOVE, {turns} LEFT/RIGHT, estimated time {time:.1f}s'.format(**router.stats))
     with open('../data/output.txt', 'w') as f:
         for movement in movements:
             f.write(movement + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import csv
+import glob
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import events
+from bytecode import read_commands
+from robot import Robot
+
+# Columns of the CSV output, REPORT lines are joined by ';'
+FIELDS = ['file', 'x', 'y', 'direction', 'reports', 'executed', 'ignored.place', 'ignored.edge', 'ignored.unplaced',
+          'ignored.unknown', 'seconds', 'error']
+
+
+def run_file(task) -> dict:
+    """Result of the commands of a file on a robot: final pose, REPORT lines, command counts and time."""
+    path, length, width = task
+    metrics = events.Metrics()
+    robot = Robot(length, width, metrics=metrics)
+    robot.output = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    try:
+        robot.process_stream(read_commands(path))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        error = '{}: {}'.format(type(e).__name__, e)
+    result = {'file': path, 'x': robot.x, 'y': robot.y, 'direction': robot.direction,
+              'reports': robot.output.getvalue().splitlines()}
+    for name in FIELDS[5:10]:
+        result[name] = metrics.counters[name]
+    result['seconds'] = time.perf_counter() - start
+    result['error'] = error
+    return result
+
+
+def find_files(patterns) -> [str]:
+    """Files of directories and glob patterns, sorted, directories give their .txt files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            with os.scandir(pattern) as entries:
+                paths.extend(entry.path for entry in entries if entry.is_file() and entry.name.endswith('.txt'))
+        else:
+            paths.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(paths))
+
+
+class BatchRunner:
+    """
+    Runs command files on a pool of worker processes, one robot per file.
+
+    Files are sent to the workers by chunks so the cost of a task is shared by many small files, and the
+    results come back in the order of the files, as soon as they are ready.
+    """
+    # Chunks of files per worker when the chunk size is not given, enough to balance uneven files
+    CHUNKS_PER_WORKER = 8
+    # Largest number of files of a chunk
+    MAX_CHUNK = 256
+
+    def __init__(self, length: int = 5, width: int = 5, workers: int = None, chunksize: int = None):
+        self.length = length
+        self.width = width
+        self.workers = workers or os.cpu_count()
+        self.chunksize = chunksize
+
+    def run(self, paths: [str]):
+        """Results of the files, in order."""
+        tasks = [(path, self.length, self.width) for path in paths]
+        chunks = self.workers * self.CHUNKS_PER_WORKER
+        chunksize = self.chunksize or max(1, min(self.MAX_CHUNK, len(tasks) // chunks))
+        if self.workers == 1 or len(tasks) <= chunksize:
+            yield from map(run_file, tasks)
+            return
+        with multiprocessing.Pool(self.workers) as pool:
+            yield from pool.imap(run_file, tasks, chunksize)
+
+
+def write_results(results, output) -> (int, int):
+    """Write results as CSV to a file whose name ends with .csv, as JSON lines otherwise, returns (files, errors)."""
+    count = errors = 0
+    is_csv = getattr(output, 'name', '').endswith('.csv')
+    writer = csv.DictWriter(output, FIELDS) if is_csv else None
+    if writer:
+        writer.writeheader()
+    for result in results:
+        count += 1
+        errors += result['error'] is not None
+        if writer:
+            writer.writerow(dict(result, reports=';'.join(result['reports'])))
+        else:
+            output.write(json.dumps(result) + '\n')
+    return count, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run directories or glob patterns of command files in parallel')
+    parser.add_argument('patterns', nargs='+', help='directories of .txt files or glob patterns, e.g. "data/*.txt"')
+    parser.add_argument('-o', '--output', default='-', help='results file, CSV if it ends with .csv, JSON lines '
+                                                            'otherwise, default: standard output')
+    parser.add_argument('-s', '--size', default='5,5', help='table length and width, default: 5,5')
+    parser.add_argument('-w', '--workers', type=int, help='worker processes, default: CPU count')
+    parser.add_argument('--chunksize', type=int, help='files sent to a worker at once, default: automatic')
+    args = parser.parse_args()
+    length, width = (int(v) for v in args.size.split(','))
+    paths = find_files(args.patterns)
+    runner = BatchRunner(length, width, args.workers, args.chunksize)
+    start = time.perf_counter()
+    if args.output == '-':
+        count, errors = write_results(runner.run(paths), sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as f:
+            count, errors = write_results(runner.run(paths), f)
+    elapsed = time.perf_counter() - start
+    print('{} files, {} errors in {:.2f}s, {:.0f} files/s'.format(count, errors, elapsed, count / max(elapsed, 1e-9)),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
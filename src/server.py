@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import events
+import planners
+from events import log, metrics
+from robot import Robot
+
+# Router of each worker process, created by the first exploration it runs
+_router = None
+
+
+def explore_table(length: int, width: int, x: int, y: int, backend: str, time_limit: float) -> [str]:
+    """Commands exploring a free table from a cell, run in a worker process."""
+    global _router
+    from cache import RouteCache
+    from routing import Router, SolverConfig
+    if _router is None or _router.backend != backend or _router.config.time_limit != time_limit:
+        _router = Router(backend=backend, cache=RouteCache(directory=RouteCache.DEFAULT_DIRECTORY),
+                         config=SolverConfig(time_limit=time_limit))
+    grid = [[0] * length for _ in range(width)]
+    grid[y][x] = 1
+    return _router.solve(grid)
+
+
+class Session:
+    """
+    Robot of a client connection, fed with batches of command lines.
+
+    Besides the robot commands a session understands:
+
+    - SIZE LENGTH,WIDTH: start again on a table of another size
+    - EXPLORE: commands exploring the table from the robot, one per line and followed by END
+    - QUIT: close the connection
+    """
+
+    def __init__(self, length: int = 5, width: int = 5):
+        self.robot = Robot(length, width)
+        self.robot.output = io.StringIO()
+        # Commands received so far, the steps of the robot follow them
+        self.steps = 0
+
+    def run(self, commands: [str]) -> str:
+        """Execute robot commands and return the replies, a PLACE which can not be parsed replies an ERROR."""
+        robot = self.robot
+        start = self.steps
+        while commands:
+            try:
+                robot.interpret(commands, start)
+                break
+            except ValueError:
+                failed = robot.step
+                command = commands[failed - start]
+                robot.output.write('ERROR invalid command at step {}: {}\n'.format(failed + 1, command))
+                commands = commands[failed - start + 1:]
+                start = failed + 1
+        self.steps = start + len(commands)
+        replies = robot.output.getvalue()
+        robot.output.seek(0)
+        robot.output.truncate()
+        return replies
+
+    def resize(self, length: int, width: int):
+        self.robot = Robot(length, width)
+        self.robot.output = io.StringIO()
+        self.steps = 0
+
+
+class SimulationServer:
+    """
+    Line-based TCP server hosting a robot session per connection.
+
+    Clients stream commands, one per line, and get the REPORT lines back. Every read of the socket is
+    executed as one batch, and the next read waits until the replies are sent, so a client which does not
+    read its replies is slowed down instead of filling the memory of the server. Explorations are solved by
+    a pool of worker processes, a session waits for its own exploration while the others keep running.
+    """
+    # Largest number of bytes read from a connection at once
+    CHUNK = 65536
+    # Longest command line, longer lines close the connection
+    MAX_LINE = 1024
+    # Largest table of a session
+    MAX_CELLS = 10 ** 6
+    # Largest table explored
+    MAX_EXPLORE_CELLS = 250000
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, max_sessions: int = 10000, workers: int = None,
+                 backend: str = 'auto', time_limit: float = 15, idle_timeout: float = 300):
+        if backend != 'auto' and backend not in planners.PLANNERS:
+            raise ValueError('unknown backend "{}", available backends: {}'.format(backend,
+                                                                                 ['auto'] + planners.names()))
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.workers = workers
+        self.backend = backend
+        self.time_limit = time_limit
+        self.idle_timeout = idle_timeout
+        # Writers of the connected sessions
+        self.sessions = set()
+        self.server = None
+        self.executor = None
+
+    async def start(self):
+        """Start listening, port 0 picks a free port which is then kept in self.port."""
+        # Forked workers would inherit the sockets of the connected clients and keep them open
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=self.CHUNK)
+        self.port = self.server.sockets[0].getsockname()[1]
+        log.info('listening on %s:%s', self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        for writer in self.sessions:
+            writer.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            metrics.counters['sessions.rejected'] += 1
+            writer.write(b'ERROR too many sessions\n')
+            await writer.drain()
+            writer.close()
+            return
+        self.sessions.add(writer)
+        metrics.counters['sessions'] += 1
+        try:
+            await self.serve_session(reader, writer)
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            log.info('session closed: %s', e)
+        except asyncio.CancelledError:
+            # The server is closing
+            log.info('session cancelled')
+        finally:
+            self.sessions.discard(writer)
+            writer.close()
+
+    async def serve_session(self, reader, writer):
+        session = Session()
+        pending = b''
+        while True:
+            data = await asyncio.wait_for(reader.read(self.CHUNK), self.idle_timeout)
+            if not data:
+                return
+            *lines, pending = (pending + data).split(b'\n')
+            if len(pending) > self.MAX_LINE or any(len(line) > self.MAX_LINE for line in lines):
+                writer.write('ERROR line longer than {} bytes\n'.format(self.MAX_LINE).encode())
+                await writer.drain()
+                return
+            commands = []
+            for line in lines:
+                command = line.decode(errors='replace').rstrip('\r')
+                if command in ('EXPLORE', 'QUIT') or command.startswith('SIZE '):
+                    writer.write(session.run(commands).encode())
+                    commands = []
+                    if command == 'QUIT':
+                        await writer.drain()
+                        return
+                    reply = await self.explore(session) if command == 'EXPLORE' else self.resize(session, command)
+                    writer.write(reply.encode())
+                else:
+                    commands.append(command)
+            writer.write(session.run(commands).encode())
+            await writer.drain()
+
+    def resize(self, session, command: str) -> str:
+        try:
+            length, width = (int(v) for v in command[5:].split(','))
+        except ValueError:
+            return 'ERROR invalid command: {}\n'.format(command)
+        if length <= 0 or width <= 0 or length * width > self.MAX_CELLS:
+            return 'ERROR table larger than {} cells or empty: {}\n'.format(self.MAX_CELLS, command)
+        session.resize(length, width)
+        return ''
+
+    async def explore(self, session) -> str:
+        robot = session.robot
+        if not robot.placed:
+            return 'ERROR please provide available PLACE command at first.\n'
+        if robot.length * robot.width > self.MAX_EXPLORE_CELLS:
+            return 'ERROR table larger than {} cells can not be explored\n'.format(self.MAX_EXPLORE_CELLS)
+        metrics.counters['explorations'] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timer('solve'):
+                commands = await loop.run_in_executor(self.executor, explore_table, robot.length, robot.width,
+                                                      robot.x, robot.y, self.backend, self.time_limit)
+        except (RuntimeError, OSError) as e:
+            return 'ERROR exploration failed: {}\nEND\n'.format(e)
+        return ''.join(command + '\n' for command in commands) + 'END\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Toy Robot Simulator server, a robot session per TCP connection')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on, default: 127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='port to listen on, default: 8765')
+    parser.add_argument('--max-sessions', type=int, default=10000, help='largest number of connected sessions')
+    parser.add_argument('-w', '--workers', type=int, help='processes solving the explorations, default: CPU count')
+    parser.add_argument('-b', '--backend', default='auto', help='planner of the explorations, default: auto')
+    parser.add_argument('--time-limit', type=float, default=15, help='search budget of an exploration in seconds')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the sessions and ignored commands')
+    args = parser.parse_args()
+    if args.verbose:
+        events.enable(logging.INFO)
+    server = SimulationServer(args.host, args.port, args.max_sessions, args.workers, args.backend, args.time_limit)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
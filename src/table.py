@@ -0,0 +1,207 @@
+import numpy as np
+
+from batch import BatchSimulator
+
+
+class Table:
+    """
+    Table holding many robots, addressed by id, with an occupancy index of the cells.
+
+    occupant[y, x] is the id of the robot on a cell, -1 for a free cell, so collision checks are O(1).
+    Robots are advanced in lockstep, one command per robot and per step:
+    - a MOVE is ignored when it would leave the table or enter a cell occupied at the start of the step,
+      when several robots move into the same free cell the lowest id gets it
+    - PLACE commands are applied after the moves, on a free cell or the robot's own cell
+    """
+    DIRECTIONS = BatchSimulator.DIRECTIONS
+    NOP, MOVE, LEFT, RIGHT, REPORT, OTHER, PLACE = range(7)
+    # Offsets of a MOVE in the order of DIRECTIONS
+    DX = np.array([0, 1, 0, -1], dtype=np.int32)
+    DY = np.array([1, 0, -1, 0], dtype=np.int32)
+
+    # Constructor with default table length and width
+    def __init__(self, length: int = 5, width: int = 5, robots: int = 0):
+        self.length = length
+        self.width = width
+        # Robot id of every cell, -1 for a free cell, with a spare last slot that absorbs masked writes
+        self.cells = np.full(width * length + 1, -1, dtype=np.int32)
+        self.occupant = self.cells[:-1].reshape(width, length)
+        self.x = np.zeros(robots, dtype=np.int32)
+        self.y = np.zeros(robots, dtype=np.int32)
+        self.heading = np.zeros(robots, dtype=np.int8)
+        self.placed = np.zeros(robots, dtype=bool)
+        self.ignored = np.zeros(robots, dtype=np.int64)
+        self.collisions = 0
+        self.step_count = 0
+        # Scheduled program: effects of the commands (steps x robots) and PLACE table (step, robot, x, y, heading)
+        self.ops = None
+        self.waits = self.turns = self.moves = None
+        self.ids = None
+        self.places = None
+        self.place_bounds = None
+        self.cursor = 0
+        self.reports = []
+
+    def __len__(self):
+        return len(self.x)
+
+    def add_robot(self) -> int:
+        """Add an unplaced robot and return its id."""
+        self.x = np.append(self.x, 0).astype(np.int32)
+        self.y = np.append(self.y, 0).astype(np.int32)
+        self.heading = np.append(self.heading, 0).astype(np.int8)
+        self.placed = np.append(self.placed, False)
+        self.ignored = np.append(self.ignored, 0)
+        return len(self) - 1
+
+    def is_valid_position(self, x, y):
+        return 0 <= x < self.length and 0 <= y < self.width
+
+    def is_free(self, x, y):
+        return self.occupant[y, x] < 0
+
+    def pose(self, robot):
+        """(x, y, direction) of a robot, (None, None, None) if it is not placed."""
+        if not self.placed[robot]:
+            return None, None, None
+        return int(self.x[robot]), int(self.y[robot]), self.DIRECTIONS[self.heading[robot]]
+
+    # Process a single command for one robot
+    def command(self, robot: int, command: str):
+        if command.startswith('PLACE '):
+            x, y, direction = command[6:].split(',')
+            return self.place(robot, int(x), int(y), direction)
+        if not self.placed[robot]:
+            self.ignored[robot] += 1
+        elif command == 'MOVE':
+            self.move(robot)
+        elif command == 'LEFT':
+            self.heading[robot] = (self.heading[robot] - 1) % 4
+        elif command == 'RIGHT':
+            self.heading[robot] = (self.heading[robot] + 1) % 4
+        elif command == 'REPORT':
+            self.report(robot)
+
+    def place(self, robot, x, y, direction):
+        if not self.is_valid_position(x, y) or direction not in self.DIRECTIONS or \
+                self.occupant[y, x] not in (-1, robot):
+            self.ignored[robot] += 1
+            return
+        if self.placed[robot]:
+            self.occupant[self.y[robot], self.x[robot]] = -1
+        self.x[robot], self.y[robot] = x, y
+        self.heading[robot] = self.DIRECTIONS.index(direction)
+        self.placed[robot] = True
+        self.occupant[y, x] = robot
+
+    def move(self, robot):
+        dx, dy = self.DX[self.heading[robot]], self.DY[self.heading[robot]]
+        x, y = self.x[robot] + dx, self.y[robot] + dy
+        if not self.is_valid_position(x, y) or not self.is_free(x, y):
+            self.ignored[robot] += 1
+            if self.is_valid_position(x, y):
+                self.collisions += 1
+            return
+        self.occupant[self.y[robot], self.x[robot]] = -1
+        self.occupant[y, x] = robot
+        self.x[robot], self.y[robot] = x, y
+
+    def report(self, robot):
+        self.reports.append((robot, self.step_count) + self.pose(robot))
+
+    def schedule(self, scripts):
+        """
+        Schedule a script per robot, either a list indexed by robot id or a dict {robot id: script}.
+
+        Missing robots are added, the scripts are then run by step() or run().
+        """
+        if isinstance(scripts, dict):
+            count = max(max(scripts) + 1, len(self)) if scripts else len(self)
+            scripts = [scripts.get(robot, []) for robot in range(count)]
+        while len(self) < len(scripts):
+            self.add_robot()
+        scripts = list(scripts) + [[] for _ in range(len(self) - len(scripts))]
+        self.ops, self.places = BatchSimulator(self.length, self.width).compile(scripts)
+        # Effect of every command, found once for the whole program
+        self.waits = ((self.ops >= self.MOVE) & (self.ops <= self.OTHER)).view(np.int8)
+        self.turns = 3 * (self.ops == self.LEFT).view(np.int8) + (self.ops == self.RIGHT).view(np.int8)
+        self.moves = (self.ops == self.MOVE).view(np.int8)
+        self.ids = np.arange(len(self), dtype=np.int32)
+        self.place_bounds = np.searchsorted(self.places[:, 0], np.arange(len(self.ops) + 1))
+        self.cursor = 0
+
+    def step(self) -> bool:
+        """Advance every robot by its next scheduled command, returns False when the scripts are over."""
+        if self.ops is None or self.cursor >= len(self.ops):
+            return False
+        t = self.cursor
+        placed = self.placed.view(np.int8)
+        # Any command but PLACE is ignored until the robot has been placed
+        self.ignored += self.waits[t] * (1 - placed)
+        self.heading += self.turns[t] * placed
+        self.heading &= 3
+        move = self.moves[t] * placed
+        if move.any():
+            self.move_all(move)
+        reporters = np.flatnonzero((self.ops[t] == self.REPORT) & self.placed)
+        for robot in reporters.tolist():
+            self.report(robot)
+        # PLACE on a valid, free position and direction
+        if self.place_bounds[t] < self.place_bounds[t + 1]:
+            _, robots, px, py, ph = self.places[self.place_bounds[t]:self.place_bounds[t + 1]].T
+            for robot, x, y, h in zip(robots.tolist(), px.tolist(), py.tolist(), ph.tolist()):
+                self.place(robot, x, y, self.DIRECTIONS[h] if h >= 0 else None)
+        self.cursor += 1
+        self.step_count += 1
+        return True
+
+    def move_all(self, move):
+        """
+        Move the robots flagged in move (0 or 1 per robot) at once.
+
+        Targets are checked against the occupancy at the start of the step. Every array has one entry
+        per robot, robots which do not move write into the spare cell instead of being filtered out.
+        """
+        heading = self.heading
+        # Offsets of a MOVE: EAST and WEST are the odd headings
+        odd = heading & 1
+        mx = odd * (2 - heading) * move
+        my = (1 - odd) * (1 - heading) * move
+        tx = self.x + mx
+        ty = self.y + my
+        # Negative positions wrap around to large unsigned values
+        inside = (tx.view(np.uint32) < self.length) & (ty.view(np.uint32) < self.width)
+        cells = self.cells
+        spare = len(cells) - 1
+        ids = self.ids
+        # Cell indexes are kept as intp, other integer types are converted by every fancy index. Masked
+        # selections are done with arithmetic, which is faster than np.where on random masks
+        valid = inside & move.view(bool)
+        target = spare + (ty.astype(np.intp) * self.length + tx - spare) * valid
+        moving = valid & (cells.take(target) < 0)
+        target = spare + (target - spare) * moving
+        # Claims are written into the free cells as -2 - id, the other claimants of a contested cell then
+        # raise it to the claim of the lowest id
+        claims = -2 - ids
+        cells[target] = claims
+        won = moving & (cells.take(target) == claims)
+        lost = moving & ~won
+        if lost.any():
+            np.maximum.at(cells, target[lost], claims[lost])
+            won = moving & (cells.take(target) == claims)
+        self.ignored += move & ~won
+        self.collisions += int(np.count_nonzero(valid & ~won))
+        # Every claimed cell has a winner which now occupies it
+        cells[spare + (target - spare) * won] = ids
+        cells[spare + (self.y.astype(np.intp) * self.length + self.x - spare) * won] = -1
+        self.x += mx * won
+        self.y += my * won
+
+    def run(self, scripts=None, steps: int = None):
+        """Schedule the scripts if given and step until they are over or for a number of steps."""
+        if scripts is not None:
+            self.schedule(scripts)
+        count = 0
+        while (steps is None or count < steps) and self.step():
+            count += 1
+        return count
@@ -0,0 +1,120 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from grid import GridGraph
+
+
+def solve_tile(cells, origin, backend, config):
+    """Cover one tile, returns the walk as (x, y) cells of the whole table. Runs in a worker process."""
+    from routing import Router
+    data, routes = Router(backend=backend, config=config).plan(cells)
+    ox, oy = origin
+    return [(data['locations'][node][0] + ox, data['locations'][node][1] + oy) for node in routes[0]]
+
+
+class TiledPlanner:
+    """
+    Coverage of large tables by decomposition into square tiles.
+
+    Every connected part of every tile is covered on its own in a process pool, one worker per core.
+    The parts are visited tile by tile in a serpentine order starting from the tile of the start cell,
+    and consecutive walks are stitched together by the shortest walk between them.
+
+    With the 'auto' backend free tiles are swept and the others planned by the greedy planner, a solver
+    backend shares the search budget of the config between the tiles.
+    """
+
+    def __init__(self, tile_size: int = 32, workers: int = None, backend: str = 'auto', config=None):
+        self.tile_size = tile_size
+        self.workers = workers or os.cpu_count()
+        self.backend = backend
+        # Tiles are solved in other processes, improvements of a tile are not streamed
+        self.config = copy.copy(config)
+        if self.config is not None:
+            self.config.callback = None
+
+    def solve(self, data):
+        """Plan the route of the single vehicle in data, returns the routes as node ids."""
+        graph = data['graph']
+        depot = data['depot']
+        parts = self.split(graph, depot)
+        config = self.config
+        if config is not None and len(parts) > 1:
+            # Tiles solved at once by the workers share the same part of the budget
+            config = copy.copy(config)
+            config.time_limit = config.time_limit * min(self.workers, len(parts)) / len(parts)
+        tasks = [part + (config,) for part in parts]
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                chunksize = max(1, len(tasks) // (self.workers * 4))
+                walks = list(executor.map(solve_tile, *zip(*tasks), chunksize=chunksize))
+        else:
+            walks = [solve_tile(*task) for task in tasks]
+        route = []
+        for walk in walks:
+            nodes = graph.node_of[[y for _, y in walk], [x for x, _ in walk]].tolist()
+            if route:
+                route.extend(self.connect(graph, route[-1], nodes[0])[1:-1])
+            route.extend(nodes)
+        return [route]
+
+    def tiles(self, graph, depot):
+        """Origins of the tiles in serpentine order, starting from the tile holding the depot."""
+        size = self.tile_size
+        rows = range(0, graph.height, size)
+        order = []
+        for k, y in enumerate(rows):
+            cols = range(0, graph.width, size)
+            order.extend((x, y) for x in (cols if k % 2 == 0 else reversed(cols)))
+        first = order.index((int(graph.xs[depot]) // size * size, int(graph.ys[depot]) // size * size))
+        return order[first:] + order[:first]
+
+    def split(self, graph, depot):
+        """Sub-problems (cells, origin, backend) of every connected part of every tile, in visiting order."""
+        size = self.tile_size
+        parts = []
+        previous = (int(graph.xs[depot]), int(graph.ys[depot]))
+        for ox, oy in self.tiles(graph, depot):
+            free = graph.free[oy:oy + size, ox:ox + size]
+            if not free.any():
+                continue
+            tile = GridGraph(np.where(free, 0, -1))
+            remaining = np.ones(len(tile), dtype=bool)
+            while remaining.any():
+                # Enter each part at the cell closest to where the previous part was
+                candidates = np.flatnonzero(remaining)
+                steps = (np.abs(tile.xs[candidates] + ox - previous[0])
+                         + np.abs(tile.ys[candidates] + oy - previous[1]))
+                entry = int(candidates[np.argmin(steps)])
+                component = tile.reachable(entry)
+                remaining &= ~component
+                cells = np.full(free.shape, -1, dtype=np.int8)
+                cells[tile.ys[component], tile.xs[component]] = 0
+                cells[tile.ys[entry], tile.xs[entry]] = 1
+                backend = self.backend
+                if backend == 'auto' and component.sum() < free.size:
+                    # A solver run per tile would spend the whole budget of the search on every tile
+                    backend = 'greedy'
+                parts.append((cells, (ox, oy), backend))
+                previous = (ox + size // 2, oy + size // 2)
+        return parts
+
+    def connect(self, graph, from_node, to_node):
+        """Shortest walk between two nodes, searched around them first and over the whole table otherwise."""
+        if from_node == to_node or to_node in graph.neighbors[from_node]:
+            return [from_node, to_node]
+        xs = (int(graph.xs[from_node]), int(graph.xs[to_node]))
+        ys = (int(graph.ys[from_node]), int(graph.ys[to_node]))
+        margin = self.tile_size
+        x0, x1 = max(min(xs) - margin, 0), min(max(xs) + margin + 1, graph.width)
+        y0, y1 = max(min(ys) - margin, 0), min(max(ys) + margin + 1, graph.height)
+        local = GridGraph(np.where(graph.free[y0:y1, x0:x1], 0, -1))
+        start = local.node_of[ys[0] - y0, xs[0] - x0]
+        end = local.node_of[ys[1] - y0, xs[1] - x0]
+        if local.distance(start, end) < local.PENALTY:
+            walk = local.path(start, end)
+            return graph.node_of[local.ys[walk] + y0, local.xs[walk] + x0].tolist()
+        return graph.path(from_node, to_node)
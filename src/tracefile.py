@@ -0,0 +1,220 @@
+import argparse
+import mmap
+from array import array
+
+import numpy as np
+
+from bytecode import DIRECTIONS, LEFT, MOVE, PLACE, REPORT, RIGHT
+
+# Header of a trace file: table size, keyframe interval, number of records and offset of the index
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4'), ('length', '<i8'), ('width', '<i8'),
+                   ('interval', '<u8'), ('count', '<u8'), ('index_offset', '<u8'), ('index_count', '<u8')])
+MAGIC = b'RBTTRACE'
+VERSION = 1
+# State of the robot after a command: step of the command, position, heading and event flags
+RECORD = np.dtype([('step', '<u8'), ('x', '<i4'), ('y', '<i4'), ('heading', 'i1'), ('flags', 'u1'), ('pad', 'V6')])
+# Event flags of a record, KEYFRAME marks the first record of every interval of steps
+PLACED, MOVED, TURNED, REPORTED, KEYFRAME = 1, 2, 4, 8, 128
+
+
+class TraceWriter:
+    """
+    Records the states of a robot into a binary trace file.
+
+    The file holds a header, one fixed-width RECORD per command that changed the state of the robot or
+    reported it, and an index giving the first record of every interval of steps. Ignored commands leave
+    no record, the steps of the records have gaps where they were. Records are buffered and written by
+    chunks, the header and the index are written by close().
+    """
+    # Steps between two keyframes
+    INTERVAL = 4096
+    # Records buffered before they are written
+    CHUNK = 65536
+
+    def __init__(self, path: str, length: int, width: int, interval: int = INTERVAL):
+        self.file = open(path, 'wb')
+        self.length = length
+        self.width = width
+        self.interval = interval
+        self.count = 0
+        # index[k] is the number of records of the steps before k * interval
+        self.index = []
+        # Buffered records, as consecutive (step, x, y, heading, flags) values
+        self.buffer = array('q')
+        self.file.write(bytes(HEADER.itemsize))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, step: int, x: int, y: int, heading: int, flags: int):
+        """Record the state after the command of a step."""
+        self.buffer.extend((step, x, y, heading, flags))
+        if len(self.buffer) >= self.CHUNK * 5:
+            self.flush()
+
+    def record_place(self, step: int, x: int, y: int, heading: int):
+        self.record(step, x, y, heading, PLACED)
+
+    def record_turn(self, step: int, x: int, y: int, heading: int):
+        self.record(step, x, y, heading, TURNED)
+
+    def record_report(self, step: int, x: int, y: int, heading: int):
+        self.record(step, x, y, heading, REPORTED)
+
+    def record_moves(self, step: int, x: int, y: int, heading: int, count: int):
+        """Record a run of count MOVE commands of consecutive steps from (x, y), the position before the run."""
+        dx, dy = (0, 1, 0, -1)[heading], (1, 0, -1, 0)[heading]
+        extend = self.buffer.extend
+        for i in range(1, count + 1):
+            extend((step + i - 1, x + dx * i, y + dy * i, heading, MOVED))
+        if len(self.buffer) >= self.CHUNK * 5:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records, the first record of every new interval of steps is marked as a keyframe."""
+        if not self.buffer:
+            return
+        values = np.frombuffer(self.buffer, dtype=np.int64).reshape(-1, 5)
+        records = np.zeros(len(values), dtype=RECORD)
+        for i, name in enumerate(RECORD.names[:5]):
+            records[name] = values[:, i]
+        last = int(records['step'][-1]) // self.interval
+        starts = np.searchsorted(records['step'], np.arange(len(self.index), last + 1) * self.interval)
+        records['flags'][np.unique(starts)] |= KEYFRAME
+        self.index.extend((starts + self.count).tolist())
+        self.file.write(records.tobytes())
+        self.count += len(records)
+        del values
+        self.buffer = array('q')
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        # The last entry bounds the records of the last interval
+        index = np.array(self.index + [self.count], dtype='<u8')
+        index_offset = self.file.tell()
+        self.file.write(index.tobytes())
+        header = np.array([(MAGIC, VERSION, RECORD.itemsize, self.length, self.width, self.interval, self.count,
+                            index_offset, len(index))], dtype=HEADER)
+        self.file.seek(0)
+        self.file.write(header.tobytes())
+        self.file.close()
+
+
+class TraceReader:
+    """
+    Trace file mapped into memory, the records and the index are NumPy views of the mapping.
+
+    Nothing is read until it is used, so a trace of millions of steps opens at once and the state at any
+    step is found with the index and a search among the records of a single interval.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.frombuffer(self.map, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION or header['record_size'] != RECORD.itemsize:
+            self.map.close()
+            raise ValueError('{} is not a trace file of version {}'.format(path, VERSION))
+        self.length = int(header['length'])
+        self.width = int(header['width'])
+        self.interval = int(header['interval'])
+        self.records = np.frombuffer(self.map, dtype=RECORD, count=int(header['count']), offset=HEADER.itemsize)
+        self.index = np.frombuffer(self.map, dtype='<u8', count=int(header['index_count']),
+                                   offset=int(header['index_offset']))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # The mapping is closed once the views taken from it are released
+        self.records = self.index = None
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+    @property
+    def steps(self):
+        return self.records['step']
+
+    @property
+    def x(self):
+        return self.records['x']
+
+    @property
+    def y(self):
+        return self.records['y']
+
+    @property
+    def heading(self):
+        return self.records['heading']
+
+    @property
+    def flags(self):
+        return self.records['flags']
+
+    def locate(self, step: int) -> int:
+        """Index of the record of the state after the command of a step, -1 before the first PLACE."""
+        k = step // self.interval
+        if k >= len(self.index) - 1:
+            return len(self.records) - 1
+        start, stop = int(self.index[k]), int(self.index[k + 1])
+        return start + int(np.searchsorted(self.records['step'][start:stop], step, side='right')) - 1
+
+    def state(self, step: int):
+        """(x, y, direction) of the robot after the command of a step, (None, None, None) before the first PLACE."""
+        i = self.locate(step)
+        if i < 0:
+            return None, None, None
+        record = self.records[i]
+        return int(record['x']), int(record['y']), DIRECTIONS[record['heading']]
+
+    def actions(self, chunk: int = 65536):
+        """Records as the (opcode, step, a, b, c) actions of a replay, one per command like a compiled program."""
+        heading = None
+        for start in range(0, len(self.records), chunk):
+            records = self.records[start:start + chunk]
+            for step, x, y, h, flags in zip(*(records[name].tolist() for name in RECORD.names[:5])):
+                if flags & PLACED:
+                    yield PLACE, step, x, y, h
+                elif flags & MOVED:
+                    yield MOVE, step, 1, 0, 0
+                elif flags & TURNED:
+                    yield LEFT if (h - heading) % 4 == 3 else RIGHT, step, 0, 0, 0
+                elif flags & REPORTED:
+                    yield REPORT, step, 0, 0, 0
+                heading = h
+
+    def reports(self):
+        """Records of the REPORT commands."""
+        return self.records[(self.records['flags'] & REPORTED) != 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summary of a trace file and states of the robot at some steps')
+    parser.add_argument('trace', help='trace file recorded by "robot.py --trace"')
+    parser.add_argument('steps', nargs='*', type=int, help='steps to print the state of the robot at')
+    args = parser.parse_args()
+    with TraceReader(args.trace) as trace:
+        flags = trace.flags
+        print('{}x{} table, {} records up to step {}, {} PLACE, {} MOVE, {} LEFT/RIGHT, {} REPORT'.format(
+            trace.length, trace.width, len(trace), int(trace.steps[-1]) if len(trace) else None,
+            np.count_nonzero(flags & PLACED), np.count_nonzero(flags & MOVED), np.count_nonzero(flags & TURNED),
+            np.count_nonzero(flags & REPORTED)))
+        for step in args.steps:
+            print(step, *trace.state(step))
+
+
+if __name__ == '__main__':
+    main()
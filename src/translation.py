@@ -0,0 +1,110 @@
+from array import array
+
+import numpy as np
+
+from bytecode import DIRECTIONS, LEFT, MOVE, NAMES, PLACE, RIGHT, Program
+
+# Heading of a hop from its (dx + 2) * 5 + dy + 2 code, offsets clipped to [-2, 2], -1 for cells which are not adjacent
+HEADING_OF_DELTA = np.full(25, -1, dtype=np.int8)
+for _heading, (_dx, _dy) in enumerate(((0, 1), (1, 0), (0, -1), (-1, 0))):
+    HEADING_OF_DELTA[(_dx + 2) * 5 + _dy + 2] = _heading
+# Commands of a hop by its turn, (heading of the hop - heading of the robot) % 4, padded with -1
+SEQUENCES = np.array([[MOVE, -1, -1], [RIGHT, MOVE, -1], [LEFT, LEFT, MOVE], [LEFT, MOVE, -1]], dtype=np.int8)
+LENGTHS = np.count_nonzero(SEQUENCES >= 0, axis=1)
+# Text of the opcodes of a translation, by opcode
+TEXTS = np.array([NAMES.get(op) for op in range(max(NAMES) + 1)], dtype=object)
+# Hops between cells which are not adjacent, with the heading of the robot before them
+INVALID = np.dtype([('hop', np.int64), ('x0', np.int64), ('y0', np.int64), ('x1', np.int64), ('y1', np.int64),
+                    ('heading', np.int8)])
+
+
+class Translation:
+    """
+    Commands of a walk over the cells of a table: a PLACE on its first cell, then for every hop the turns
+    towards the next cell and a MOVE.
+
+    Hops between cells which are not adjacent give no command and leave the heading of the robot as it
+    was, they are kept in invalid and described together by report().
+    """
+
+    def __init__(self, x: int, y: int, heading: int, ops, invalid):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        # Opcodes after the PLACE, one per command
+        self.ops = ops
+        self.invalid = invalid
+
+    def __len__(self):
+        return len(self.ops) + 1
+
+    def commands(self) -> [str]:
+        return ['PLACE {},{},{}'.format(self.x, self.y, DIRECTIONS[self.heading])] + np.take(TEXTS, self.ops).tolist()
+
+    def program(self) -> Program:
+        """Commands as a compiled program, runs of MOVE folded into a record like compile_commands does."""
+        ops = self.ops.astype(np.int64)
+        moves = ops == MOVE
+        # A record starts at every command but a MOVE following a MOVE
+        starts = np.flatnonzero(~(moves & np.concatenate(([False], moves[:-1]))))
+        records = np.zeros((len(starts) + 1, 5), dtype=np.int64)
+        records[0] = PLACE, 0, self.x, self.y, self.heading
+        records[1:, 0] = ops[starts]
+        records[1:, 1] = starts + 1
+        records[1:, 2] = np.where(moves[starts], np.diff(np.append(starts, len(ops))), 0)
+        code = array('q')
+        code.frombytes(records.tobytes())
+        return Program(code)
+
+    def report(self) -> dict:
+        """Invalid hops as a dictionary: their count and every hop with its cells and the heading before it."""
+        return {
+            'invalid_hops': len(self.invalid),
+            'hops': [{'hop': hop, 'from': (x0, y0), 'to': (x1, y1), 'heading': DIRECTIONS[heading]}
+                     for hop, x0, y0, x1, y1, heading in self.invalid.tolist()],
+        }
+
+
+def translate(xs, ys, heading: int = 1) -> Translation:
+    """Translate a walk given by the coordinates of its cells, the robot starts with a heading, EAST by default."""
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    codes = np.clip(np.diff(xs), -2, 2).astype(np.int8) * 5
+    codes += np.clip(np.diff(ys), -2, 2).astype(np.int8)
+    codes += 12
+    hops = np.take(HEADING_OF_DELTA, codes)
+    valid = hops >= 0
+    headings = hops[valid]
+    turns = np.empty_like(headings)
+    np.subtract(headings[1:], headings[:-1], out=turns[1:])
+    turns[:1] = headings[:1] - heading
+    turns &= 3
+    # Every hop ends with a MOVE, the commands of the hops which turn are written over the MOVE filling
+    lengths = np.take(LENGTHS, turns)
+    starts = np.cumsum(lengths) - lengths
+    ops = np.full(int(lengths.sum()), MOVE, dtype=np.int8)
+    turned = np.flatnonzero(turns)
+    for k in range(SEQUENCES.shape[1] - 1):
+        turned = turned[lengths[turned] > k + 1]
+        ops[starts[turned] + k] = SEQUENCES[turns[turned], k]
+    invalid = np.zeros(np.count_nonzero(~valid), dtype=INVALID)
+    if len(invalid):
+        hop = np.flatnonzero(~valid)
+        # Heading before an invalid hop: the heading of the last valid hop before it
+        last = np.maximum.accumulate(np.where(valid, np.arange(len(hops)), -1))
+        before = np.concatenate(([-1], last))[hop]
+        invalid['hop'] = hop
+        invalid['x0'], invalid['y0'] = xs[hop], ys[hop]
+        invalid['x1'], invalid['y1'] = xs[hop + 1], ys[hop + 1]
+        invalid['heading'] = np.where(before >= 0, hops[np.maximum(before, 0)], heading)
+    return Translation(int(xs[0]), int(ys[0]), heading, ops, invalid)
+
+
+def translate_route(data, route, heading: int = 1) -> Translation:
+    """Translate a route of node ids of a data model, the route can be an int array."""
+    route = np.asarray(route, dtype=np.int64)
+    graph = data.get('graph')
+    if graph is not None:
+        return translate(graph.xs[route], graph.ys[route], heading)
+    locations = np.asarray(data['locations'], dtype=np.int64).reshape(-1, 2)
+    return translate(locations[route, 0], locations[route, 1], heading)